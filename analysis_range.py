@@ -2,37 +2,7 @@ import numpy as np
 import scipy as sp
 import matplotlib.pyplot as plt
 import os
-import re
-
-def opendata(path, tag):
-    stepmap = {}
-    for root, dirs, files in os.walk(path, topdown=False):
-        for name in files:
-            if "stepstocompletion" in name:
-                p = os.path.join(root, name)
-                parts = root.split('/')
-                str_regex = re.compile(tag + '[0-9]+')
-                num_regex = re.compile('[0-9]+')
-                str_str_matc = str_regex.match(parts[2])
-                if str_str_matc is not None:
-                    num = int(num_regex.findall(str_str_matc.group())[0])
-                    with open(p, 'r') as f:
-                        l = int(f.read())
-                        stepmap[num] = l
-
-    return stepmap
-
-
-
-def map2array(stepmap):
-    res = []
-    for key, value in stepmap.items():
-        res.append(np.array([int(key), int(value)]))
-
-    npres = np.array(res)
-    result = np.sort(npres.view('i8,i8'), order=['f0'], axis=0).view(np.int)
-
-    return result
+from realhoomin.catalog import ResultsCatalog
 
 
 def normalize_incomplete_data(a):
@@ -49,11 +19,9 @@ def reject_outliers(data, m = 2.):
     return data[s<m]
 
 os.chdir('./newrun-range')
-highrangedata = opendata("./logs", "highrange")
-lowrangedata = opendata("./logs/", "lowrange")
-
-highrangearray = map2array(highrangedata)
-lowrangearray = map2array(lowrangedata)
+catalog = ResultsCatalog("./logs")
+highrangearray = catalog.steps("highrange")
+lowrangearray = catalog.steps("lowrange")
 
 highrangekeys = highrangearray[:,0]
 highrangevals = highrangearray[:,1]
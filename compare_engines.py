@@ -0,0 +1,103 @@
+'''
+Checks that the vectorized engine behaves like the per-agent one.
+
+Runs the same configuration under both engines for a number of seeds and
+compares the steps-to-completion distributions with a two-sample
+Kolmogorov-Smirnov test. The vectorized engine always exchanges from a
+snapshot taken after everyone has moved, so the per-agent side runs with
+batchcontacts and snapshotcontacts on to match. Runs that haven't completed within the step
+budget count as taking the whole budget.
+
+    python compare_engines.py --trials 80 initial_hoomins=60 bluetooth_range=2
+
+The defaults are a small, short-range city where hoomin zero and the
+final hoomin start out of radio range. With settings.py as it is they
+start next to each other and every run finishes in a few steps whatever
+the movement does, which would only compare message sampling noise.
+Any name=value pairs override the config on top of that.
+'''
+
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from realhoomin.batch import trial_seed
+from realhoomin.config import HoominConfig
+
+
+def steps_to_completion(args):
+    from realhoomin.model import HoominWorld
+
+    tag, trial, config, maxsteps = args
+    hworld = HoominWorld(logtag=tag + str(trial), seed=trial_seed(tag, trial), config=config)
+    hworld.run_model(step_count=maxsteps)
+    hworld.logger.closeall()
+    return hworld.steps()
+
+
+def run_engine(tag, config, trials, maxsteps, workers):
+    jobs = [(tag, x, config, maxsteps) for x in range(trials)]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return np.array(list(pool.map(steps_to_completion, jobs)))
+
+
+#config fields the comparison runs with unless overridden
+DEFAULTS = {"initial_hoomins": 40, "bluetooth_range": 1}
+
+
+def value(text):
+    for kind in (int, float):
+        try:
+            return kind(text)
+        except ValueError:
+            pass
+    if text in ("True", "False"):
+        return text == "True"
+    return text
+
+
+def parse_overrides(specs):
+    overrides = dict(DEFAULTS)
+    for spec in specs:
+        name, _, text = spec.partition("=")
+        overrides[name] = value(text)
+    return overrides
+
+
+def summarize(name, steps, maxsteps):
+    print(name, "mean", steps.mean(), "median", np.median(steps), "std", steps.std(),
+          "hit budget", int((steps >= maxsteps).sum()), "of", len(steps))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="compare the agents and vectorized engines")
+    parser.add_argument("--trials", type=int, default=50)
+    parser.add_argument("--maxsteps", type=int, default=2000)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("overrides", nargs="*", help="name=value config overrides")
+    args = parser.parse_args()
+    trials, maxsteps, workers = args.trials, args.maxsteps, args.workers
+
+    base = HoominConfig.from_settings(**parse_overrides(args.overrides)).replace(agentstate="arrays")
+    #the vectorized engine moves everybody before anyone exchanges, so it's
+    #compared against the agents engine doing the same with snapshot
+    #contacts. exchanging right after each move is a different model
+    agents = run_engine("engine-agents", base.replace(engine="agents", batchcontacts=True, snapshotcontacts=True),
+                        trials, maxsteps, workers)
+    vectorized = run_engine("engine-vectorized", base.replace(engine="vectorized"), trials, maxsteps, workers)
+
+    summarize("agents     ", agents, maxsteps)
+    summarize("vectorized ", vectorized, maxsteps)
+
+    try:
+        from scipy.stats import ks_2samp
+    except ImportError:
+        print("scipy isn't installed, skipping the KS test")
+    else:
+        result = ks_2samp(agents, vectorized)
+        print("KS statistic", result.statistic, "p-value", result.pvalue)
+        if result.pvalue < 0.05:
+            print("distributions differ at the 5% level")
+        else:
+            print("no significant difference between the engines")
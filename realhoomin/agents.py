@@ -1,7 +1,8 @@
 from mesa import Agent
-import settings
 import numpy as np
 
+from realhoomin.friendbits import popcount, window
+
 
 class ScatterMessage():
     """
@@ -20,6 +21,57 @@ class ScatterMessage():
         self.message = message
 
 
+class ScatterBuffer():
+    """
+    the messages a hoomin is carrying. keeps them in arrival order for
+    sampling and indexes them by ScatterMessage.id for membership checks
+    """
+
+    def __init__(self):
+        self.messages = []
+        self.byid = {}
+        self._summary = None
+
+    def __len__(self):
+        return len(self.messages)
+
+    def __iter__(self):
+        return iter(self.messages)
+
+    def __contains__(self, message):
+        return message.id in self.byid
+
+    def append(self, message):
+        if message.id in self.byid:
+            return False
+        self.byid[message.id] = message
+        self.messages.append(message)
+        self._summary = None
+        return True
+
+    #adds every message not already in the buffer, returns how many were new
+    def merge(self, messages):
+        counter = 0
+        for message in messages:
+            if message.id not in self.byid:
+                self.byid[message.id] = message
+                self.messages.append(message)
+                counter += 1
+        if counter > 0:
+            self._summary = None
+        return counter
+
+    def sample(self, rng, k):
+        return rng.sample(self.messages, min(k, len(self.messages)))
+
+    #sorted array of the message ids in the buffer, the summary vector two
+    #hoomins compare when they meet. kept until the buffer changes
+    def summary(self):
+        if self._summary is None:
+            self._summary = np.array(sorted(self.byid), dtype=np.int64)
+        return self._summary
+
+
 class Hoomin(Agent):
     ROADHOOMIN = 1
     FLIRTHOOMIN = 2
@@ -50,11 +102,15 @@ class Hoomin(Agent):
         self.seekingroad = False
         self.home = None
         self.previous_road = None
-        self.scatterbuffer = []
-        self.scatterrange = settings.bluetooth_range
-        Hoomin.send_blockdata = settings.send_blockdata
-        Hoomin.hoomininit = settings.hoomininit
+        self.scatterbuffer = ScatterBuffer()
+        self.scatterrange = model.config.bluetooth_range
+        #this hoomin's bit in the model's friendindex, and the bits for its
+        #friends and friendships, see realhoomin/friendbits.py
+        self.nodebit = 0
+        self.friendnodebits = 0
+        self.friendedgebits = 0
         self.hoomininit()
+
     #checks the new destination for bounds and sets it as this hooman's destination
     def setdst(self, newdst):
         if newdst[0] < 0 or newdst[0] > self.model.width:
@@ -62,12 +118,12 @@ class Hoomin(Agent):
         if newdst[1] < 0 or newdst[1] > self.model.height:
             return False
 
-        self.dst = np.array(newdst)
+        self.dst = (newdst[0], newdst[1])
         return True
 
 
     def hoomininit(self):
-        True
+        self.model.config.hoomininit(self)
 
     def hoomin_dance(self):
         if self.pos is self.startingpos:
@@ -78,42 +134,55 @@ class Hoomin(Agent):
             self.model.grid.move_agent(self, self.startingpos)
 
 
-    #searches for the nearest road tile and returns it
+    #returns the position of the nearest road tile, or None if there are no roads
     def find_nearest_road(self):
-        start = np.array(self.pos)
-        road = None
-        counter = 0
-        searchwidth = 3
-        mod = np.array((0,-1))
-        while searchwidth < self.model.width:
-            pstart = start + 1
-            for x in range(4):
-                for y in range(searchwidth):
-                    if pstart[0] >= 0 and pstart[0] < self.model.width:
-                        if pstart[1] >= 0 and pstart[1] < self.model.height:
-                            cells = self.model.grid.get_cell_list_contents([pstart])
-                            for item in cells:
-                                if type(item) is Road:
-                                    return item
-                    pstart += mod
-                mod = np.array((mod[1], -1*mod[0]))
-            searchwidth += 1
-
-        return None
+        return self.model.roadmap.nearest_road(self.pos)
 
     def get_neighbor_hoomins(self, radius):
-        neighbors = self.model.grid.iter_neighborhood(self.pos, False, include_center=False, radius=radius)
-        result = []
-        for x in neighbors:
-            cellcontents = self.model.grid.get_cell_list_contents(x)
-            for val in cellcontents:
-                if type(val) is Hoomin or issubclass(type(val), Hoomin):
-                    result.append(val)
-
-        return result
+        return self.model.grid.get_hoomins_in_range(self.pos, radius)
 
     def send_blockdata(self, hoomin):
-        True
+        self.model.config.scatterfunction(self, hoomin)
+
+    #adds to what this hoomin knows about the friend graph, counting new
+    #nodes and edges so completion can be checked without comparing graphs
+    def learn_bits(self, nodebits, edgebits):
+        nodes = self.knownnodebits | nodebits
+        if nodes != self.knownnodebits:
+            self.knownnodebits = nodes
+            self.knownnodes = popcount(nodes)
+        edges = self.knownedgebits | edgebits
+        if edges != self.knownedgebits:
+            self.knownedgebits = edges
+            self.knownedges = popcount(edges)
+
+    def learn_friend(self, hoomin):
+        self.learn_bits(hoomin.nodebit, 0)
+
+    def learn_friendship(self, hoomin, friend):
+        self.learn_bits(hoomin.nodebit | friend.nodebit,
+                        self.model.friendindex.edgebit(hoomin.unique_id, friend.unique_id))
+
+    #hoomin and everything it can say about its own friends
+    def learn_friendsof(self, hoomin):
+        self.learn_bits(hoomin.nodebit | hoomin.friendnodebits, hoomin.friendedgebits)
+
+    #everything hoomin knows that this hoomin doesn't. budget caps the bytes
+    #of known-edge bitset sent, starting from the lowest edge this hoomin is
+    #missing, 0 for no limit
+    def learn_known(self, hoomin, budget=0):
+        edgebits = hoomin.knownedgebits & ~self.knownedgebits
+        if budget > 0:
+            edgebits = window(edgebits, 8 * budget)
+        self.learn_bits(hoomin.knownnodebits, edgebits)
+
+    @property
+    def friendgraph(self):
+        '''
+        what this hoomin knows of the friend graph as a networkx graph, built
+        fresh on every call, for drawing
+        '''
+        return self.model.friendindex.graph(self.model.schedule._agents, self.knownnodebits, self.knownedgebits)
 
     def store_scattermessage(self, message):
         self.scatterbuffer.append(ScatterMessage(message))
@@ -123,10 +192,11 @@ class Hoomin(Agent):
         if self.dst is None:
             return False
 
-        tovect = np.array((np.sign(self.dst[0] - self.pos[0])
-                           ,np.sign(self.dst[1] - self.pos[1])))
-        if (tovect[0] != 0) and (tovect[1] != 0):
-            self.model.grid.move_agent(self, tuple(self.pos + tovect))
+        x, y = self.pos
+        dx = int(self.dst[0]) - x
+        dy = int(self.dst[1]) - y
+        if (dx != 0) and (dy != 0):
+            self.model.grid.move_agent(self, (x + (dx > 0) - (dx < 0), y + (dy > 0) - (dy < 0)))
             return False
 
         return True
@@ -135,12 +205,12 @@ class Hoomin(Agent):
     def random_road(self):
         if self.seekingroad is False:
             road = self.find_nearest_road()
-            #print("hoomin ", self.unique_id, " found road ", road.pos)
+            #print("hoomin ", self.unique_id, " found road ", road)
             if road is None:
                 return False
             else:
                 self.seekingroad = True
-                self.dst = np.array(road.pos)
+                self.dst = road
         else:
             if self.straightwalk_to_dest() is True:
                 self.seekingroad = False
@@ -159,45 +229,52 @@ class Hoomin(Agent):
         tovect = np.array((np.sign(self.dst[0] - self.pos[0])
                            ,np.sign(self.dst[1] - self.pos[1])))
 
-        next = self.model.grid.get_neighbors(self.pos, False, True)
+        next = self.model.grid.get_neighborhood(self.pos, False, True)
         mindist = np.sqrt(pow(self.model.height,2.0) + pow(self.model.width,2.0))
         minroad = None
         for x in next:
-            if type(x) is Road:
-                rdist = np.linalg.norm(self.dst - x.pos)
+            if self.model.terrain.isroad(x):
+                rdist = np.linalg.norm(np.subtract(self.dst, x))
                 if rdist < mindist:
                     mindist = rdist
                     minroad = x
         if minroad is not None:
-            print("moving to road ", minroad.pos)
-            self.model.grid.move_agent(self, minroad.pos)
+            #print("moving to road ", minroad)
+            self.model.grid.move_agent(self, minroad)
             return True
         else:
             return False
 
 
-    def random_pathfind(self):
+    #moves one road tile along the shortest road path to the destination.
+    #hoomins that aren't on a road yet wander onto one like random_pathfind
+    def route_to_dest(self):
         if self.seekingroad is True:
             return False
+        if self.dst is None:
+            return False
 
-        #print('hoomin ', self.unique_id, " random moving")
+        nexthop = self.model.router.next_hop(self.pos, self.dst)
+        if nexthop is None:
+            return self.random_pathfind()
+
+        self.previous_road = self.pos
+        if nexthop != self.pos:
+            self.model.grid.move_agent(self, nexthop)
+        return True
 
-        next = self.model.grid.get_neighbors(self.pos, False, True)
+    def random_pathfind(self):
+        if self.seekingroad is True:
+            return False
 
-        roadchoices = []
-        for x in next:
-            if type(x) is Road:
-                roadchoices.append(x)
+        #print('hoomin ', self.unique_id, " random moving")
 
-        roadchoices = set(roadchoices)
-        if self.previous_road is not None:
-            roadchoices.difference(set([self.previous_road]))
+        road = self.model.roadmap.random_road_near(self.pos, self.random)
 
         self.previous_road = self.pos
 
-        if len(roadchoices) > 0:
-            road = self.random.sample(roadchoices, 1)
-            self.model.grid.move_agent(self, road[0].pos)
+        if road is not None:
+            self.model.grid.move_agent(self, road)
 
 
 
@@ -212,18 +289,24 @@ class Hoomin(Agent):
     def get_mode(self):
         return self.mode
 
-class Home(Agent):
-
-    claimedhomes = set()
+class Home():
+    '''
+    a home tile and who lives there. the tile itself is in the model's
+    terrain, this just keeps track of the occupants
+    '''
 
-    def __init__(self, unique_id, pos, model):
-        super().__init__(unique_id, model)
+    def __init__(self, pos, model):
+        self.pos = pos
+        self.model = model
         self.occupants = set()
-    def step(self):
-        return True
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["occupants"] = [h.unique_id for h in self.occupants]
+        return state
 
     def claim(self, hoomin:Hoomin):
-        Home.claimedhomes = Home.claimedhomes.union(set([self]))
+        self.model.claimedhomes.add(self)
         self.occupants = self.occupants.union(set([hoomin]))
         hoomin.home = self
 
@@ -242,8 +325,9 @@ class SocialHoomin(Hoomin):
         self.mode = SocialHoomin.MODE_RANDOM
         self.friendlist = friendlist #list of unique_id to socialize with
         self.onroad = False
-        self.socialswitchprob = settings.socialswitchprobability
-        self.randomswtichprob = settings.randomswitchprobability
+        self.socialswitchprob = model.config.socialswitchprobability
+        self.randomswtichprob = model.config.randomswitchprobability
+        self.shortestpath = model.config.socialrouting == "shortestpath"
 
 
     def addfriend(self, hoominid):
@@ -253,8 +337,10 @@ class SocialHoomin(Hoomin):
         else:
             self.friendlist.append(hoominid)
 
-        self.friendgraph.add_node(self.model.schedule._agents[hoominid])
-        self.friendgraph.add_edge(self.model.schedule._agents[hoominid], self.model.schedule._agents[self.unique_id])
+        friend = self.model.schedule._agents[hoominid]
+        self.friendnodebits |= friend.nodebit
+        self.friendedgebits |= self.model.friendindex.edgebit(self.unique_id, hoominid)
+        self.learn_friendship(friend, self)
 
     def setfriendlist(self, friendlist):
         self.friendlist = friendlist
@@ -262,7 +348,7 @@ class SocialHoomin(Hoomin):
     def step(self):
         if self.mode == SocialHoomin.MODE_RANDOM:
             if self.onroad:
-                self.dst = np.array(self.home.pos)
+                self.dst = self.home.pos
                 self.random_pathfind()
             else:
                 if self.random_road() is True:
@@ -284,7 +370,10 @@ class SocialHoomin(Hoomin):
             agent = self.model.schedule.get(targetfriend[0])
 
             self.dst = agent.pos
-            self.random_pathfind()
+            if self.shortestpath:
+                self.route_to_dest()
+            else:
+                self.random_pathfind()
 
         switchval = self.random.random()
 
@@ -301,7 +390,7 @@ class MeetHoomin(Hoomin):
     def __init__(self, unique_id, pos, model, meettarget):
         super().__init__(unique_id, pos, model)
 
-        self.dst = np.array(meettarget)
+        self.dst = tuple(meettarget)
 
     def step(self):
         self.straightwalk_to_dest()
@@ -313,22 +402,10 @@ class FindRoadHoomin(Hoomin):
         self.onroad = False
     def step(self):
         if self.onroad:
-            self.dst = np.array(self.home.pos)
+            self.dst = self.home.pos
             self.random_pathfind()
         else:
             if self.random_road() is True:
                 #print("starting onroad hoomin ", self.unique_id)
                 self.onroad = True
 
-
-class Road(Agent):
-    '''
-    A road tile. Roads do nothing on their own, but hoomins can
-    interact with them in various ways (mainly following them
-    between locations)
-    '''
-    def __init__(self, unique_id, pos, model):
-        super().__init__(unique_id, model)
-
-    def step(self):
-        True
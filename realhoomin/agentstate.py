@@ -0,0 +1,141 @@
+'''
+Struct-of-arrays storage for hoomin state.
+
+With the "arrays" agentstate backend, the per-hoomin fields that change
+every step (position, destination, mode, home coordinates, road flags)
+live in numpy columns indexed by a slot number, and the hoomin objects
+read and write them through properties. Batched code can then work on
+whole columns at once, and moving a hoomin or giving it a new destination
+writes into existing arrays instead of allocating new ones.
+
+This isn't a memory saving. The hoomins are still mesa Agents with an
+instance dict, and their scatterbuffers, friend lists and known friend
+bitsets stay on the objects, so a hoomin costs about the same either way
+and the population that fits in one process doesn't change.
+'''
+
+import numpy as np
+
+from realhoomin.agents import SocialHoomin
+
+
+class HoominState:
+
+    def __init__(self, capacity=64):
+        capacity = max(1, capacity)
+        self.size = 0
+        self.ids = np.zeros(capacity, dtype=np.int64)
+        self.pos = np.zeros((capacity, 2), dtype=np.int64)
+        self.placed = np.zeros(capacity, dtype=bool)
+        self.dst = np.zeros((capacity, 2), dtype=np.int64)
+        self.hasdst = np.zeros(capacity, dtype=bool)
+        self.mode = np.zeros(capacity, dtype=np.int8)
+        self.home = np.zeros((capacity, 2), dtype=np.int64)
+        self.hashome = np.zeros(capacity, dtype=bool)
+        self.onroad = np.zeros(capacity, dtype=bool)
+        self.seekingroad = np.zeros(capacity, dtype=bool)
+        self.hoomins = []
+
+    COLUMNS = ("ids", "pos", "placed", "dst", "hasdst", "mode", "home", "hashome", "onroad", "seekingroad")
+
+    def _grow(self):
+        for name in HoominState.COLUMNS:
+            col = getattr(self, name)
+            setattr(self, name, np.concatenate((col, np.zeros_like(col))))
+
+    def allocate(self, hoomin, unique_id):
+        if self.size == len(self.ids):
+            self._grow()
+        slot = self.size
+        self.size += 1
+        self.ids[slot] = unique_id
+        self.hoomins.append(hoomin)
+        return slot
+
+
+class ArrayHoomin:
+    '''
+    mixin that keeps a hoomin's per-step state in the model's HoominState.
+    has to come before the Hoomin class in the bases so its properties win
+    '''
+
+    def __init__(self, unique_id, pos, model, *args, **kwargs):
+        self._state = model.agentstate
+        self._slot = self._state.allocate(self, unique_id)
+        super().__init__(unique_id, pos, model, *args, **kwargs)
+
+    @property
+    def slot(self):
+        return self._slot
+
+    @property
+    def pos(self):
+        if not self._state.placed[self._slot]:
+            return None
+        p = self._state.pos[self._slot]
+        return (int(p[0]), int(p[1]))
+
+    @pos.setter
+    def pos(self, value):
+        if value is None:
+            self._state.placed[self._slot] = False
+        else:
+            self._state.pos[self._slot] = value
+            self._state.placed[self._slot] = True
+
+    #a view onto the dst column, so reading it doesn't allocate either
+    @property
+    def dst(self):
+        if not self._state.hasdst[self._slot]:
+            return None
+        return self._state.dst[self._slot]
+
+    @dst.setter
+    def dst(self, value):
+        if value is None:
+            self._state.hasdst[self._slot] = False
+        else:
+            self._state.dst[self._slot] = value
+            self._state.hasdst[self._slot] = True
+
+    @property
+    def mode(self):
+        return int(self._state.mode[self._slot])
+
+    @mode.setter
+    def mode(self, value):
+        self._state.mode[self._slot] = value
+
+    @property
+    def onroad(self):
+        return bool(self._state.onroad[self._slot])
+
+    @onroad.setter
+    def onroad(self, value):
+        self._state.onroad[self._slot] = value
+
+    @property
+    def seekingroad(self):
+        return bool(self._state.seekingroad[self._slot])
+
+    @seekingroad.setter
+    def seekingroad(self, value):
+        self._state.seekingroad[self._slot] = value
+
+    #the Home itself stays on the object, its coordinates go in the columns
+    @property
+    def home(self):
+        return self._home
+
+    @home.setter
+    def home(self, value):
+        self._home = value
+        if value is None or value.pos is None:
+            self._state.hashome[self._slot] = False
+        else:
+            self._state.home[self._slot] = value.pos
+            self._state.hashome[self._slot] = True
+
+
+class ArraySocialHoomin(ArrayHoomin, SocialHoomin):
+    pass
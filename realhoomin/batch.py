@@ -0,0 +1,95 @@
+'''
+Runs many HoominWorld trials across a pool of worker processes.
+
+Every trial carries its own HoominConfig and seed, so workers never depend
+on whatever the settings module happened to look like in the parent.
+Logs end up in <logdir>/<tag><trial>/ directories, logs/ unless a trial
+says otherwise.
+'''
+
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import os
+import zlib
+
+
+#layout is the path of a saved WorldLayout to build the city from, or None
+#to generate one from the seed. logdir is where the run's logs go
+TrialParams = namedtuple('TrialParams', ['tag', 'trial', 'seed', 'config', 'layout', 'logdir'], defaults=(None, "logs"))
+
+#layouts a worker has already loaded, by path
+_layouts = {}
+
+
+def trial_seed(tag, trial, baseseed=0):
+    '''
+    seed for a single trial, the same every time for the same tag and trial
+    '''
+    return zlib.crc32((str(baseseed) + ":" + tag + ":" + str(trial)).encode())
+
+
+def make_trials(tag, start, end, config, baseseed=0, layout=None, logdir="logs"):
+    return [TrialParams(tag, x, trial_seed(tag, x, baseseed), config, layout, logdir) for x in range(start, end)]
+
+
+def load_layout(path):
+    from realhoomin.layout import WorldLayout
+
+    if path not in _layouts:
+        _layouts[path] = WorldLayout.load(path)
+    return _layouts[path]
+
+
+def run_trial(params):
+    '''
+    runs one trial and returns (tag, trial, steps, censored), censored being
+    why the run was cut short or None if it completed
+    '''
+    from realhoomin.model import HoominWorld
+    from realhoomin.checkpoint import CHECKPOINTFILENAME
+
+    #a trial that was cut off carries on from its last checkpoint, as long
+    #as it was checkpointed with the same config
+    hworld = None
+    p = os.path.join(params.logdir, params.tag + str(params.trial), CHECKPOINTFILENAME)
+    if params.config.checkpointinterval > 0 and os.path.exists(p):
+        hworld = HoominWorld.resume(p)
+        if hworld.config != params.config or hworld._seed != params.seed:
+            hworld.logger.closeall()
+            hworld = None
+
+    if hworld is None:
+        layout = load_layout(params.layout) if params.layout is not None else None
+        hworld = HoominWorld(logtag=params.tag + str(params.trial), seed=params.seed, config=params.config, layout=layout,
+                             logdir=params.logdir)
+    hworld.run_model()
+    return params.tag, params.trial, hworld.steps(), hworld.censored
+
+
+def run_batch(trials, workers=None, callback=None):
+    '''
+    fans trials out over a process pool. results come back as
+    {tag : {trial : (steps, censored)}}, and callback(tag, trial, steps,
+    censored) is called as each one finishes
+    '''
+    if workers is None:
+        workers = os.cpu_count()
+
+    results = {}
+    if workers <= 1:
+        for params in trials:
+            tag, trial, steps, censored = run_trial(params)
+            results.setdefault(tag, {})[trial] = (steps, censored)
+            if callback is not None:
+                callback(tag, trial, steps, censored)
+        return results
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(run_trial, params) for params in trials]
+        for future in as_completed(futures):
+            tag, trial, steps, censored = future.result()
+            results.setdefault(tag, {})[trial] = (steps, censored)
+            if callback is not None:
+                callback(tag, trial, steps, censored)
+
+    return results
@@ -0,0 +1,148 @@
+'''
+Index of finished runs under a log directory.
+
+The first scan records every run directory (run tag, config, trial number
+and steps to completion) in a manifest file inside the log directory,
+along with the mtime and size of the files the result was read from.
+Later scans only stat those files and reread directories where they've
+changed, a run that was rerun included, so big log trees don't have to be
+reopened every time a plot gets made.
+'''
+
+import json
+import os
+import re
+
+import numpy as np
+
+from realhoomin.trace import load_censored, TRACEFILENAME, CENSOREDFILENAME
+
+
+MANIFESTNAME = ".manifest.json"
+STEPSFILENAME = "stepstocompletion"
+
+#run directories are named <config><trial>, e.g. lowrange12
+RUNNAME = re.compile(r'^(.*?)([0-9]+)$')
+
+
+def read_result(rundir):
+    '''
+    (steps, censored) for one run directory, from the stepstocompletion log
+    if there is one, or else the last row of the trace and censored.npy.
+    censored is why the run was cut short ("steps", "time", ...) or None if
+    it completed. steps is None if the run hasn't finished
+    '''
+    p = os.path.join(rundir, STEPSFILENAME)
+    if os.path.exists(p):
+        with open(p, 'r') as f:
+            val = f.read().split()
+        if len(val) > 0:
+            if len(val) > 2 and val[1] == "censored":
+                return int(val[0]), val[2]
+            return int(val[0]), None
+
+    p = os.path.join(rundir, TRACEFILENAME)
+    if os.path.exists(p):
+        trace = np.load(p, mmap_mode="r")
+        #recording runs keep going after they complete, the first completed
+        #row is the one that counts
+        if len(trace) > 0 and trace["completed"][-1]:
+            return int(trace["step"][np.argmax(trace["completed"])]), None
+
+    p = os.path.join(rundir, CENSOREDFILENAME)
+    if os.path.exists(p):
+        return load_censored(p)
+
+    return None, None
+
+
+#(name, mtime, size) of each result file in rundir, a run needs reading
+#again whenever this changes
+def result_stamp(rundir):
+    stamp = []
+    for name in (STEPSFILENAME, TRACEFILENAME, CENSOREDFILENAME):
+        try:
+            st = os.stat(os.path.join(rundir, name))
+        except FileNotFoundError:
+            continue
+        stamp.append([name, st.st_mtime_ns, st.st_size])
+    return stamp
+
+
+#steps to completion, None for runs that are unfinished or were censored
+def read_steps(rundir):
+    steps, censored = read_result(rundir)
+    if censored is not None:
+        return None
+    return steps
+
+
+class ResultsCatalog:
+
+    def __init__(self, logdir):
+        self.logdir = logdir
+        self.manifestpath = os.path.join(logdir, MANIFESTNAME)
+        self.entries = {}
+
+        if os.path.exists(self.manifestpath):
+            with open(self.manifestpath, 'r') as f:
+                self.entries = json.load(f)
+
+        self.refresh()
+
+    def refresh(self):
+        '''
+        picks up run directories that appeared since the last scan and
+        rechecks any whose result files have changed
+        '''
+        changed = False
+        with os.scandir(self.logdir) as it:
+            for d in it:
+                if not d.is_dir():
+                    continue
+
+                m = RUNNAME.match(d.name)
+                if m is None:
+                    continue
+
+                stamp = result_stamp(d.path)
+                entry = self.entries.get(d.name)
+                if entry is not None and entry.get("stamp") == stamp:
+                    continue
+
+                steps, censored = read_result(d.path)
+                self.entries[d.name] = {"run": d.name,
+                                        "config": m.group(1),
+                                        "trial": int(m.group(2)),
+                                        "steps": steps,
+                                        "censored": censored,
+                                        "stamp": stamp}
+                changed = True
+
+        if changed:
+            self.save()
+
+    def save(self):
+        tmp = self.manifestpath + ".tmp"
+        with open(tmp, 'w') as f:
+            json.dump(self.entries, f)
+        os.replace(tmp, self.manifestpath)
+
+    def configs(self):
+        return sorted(set(e["config"] for e in self.entries.values()))
+
+    def runs(self, config):
+        return [e for e in self.entries.values() if e["config"] == config]
+
+    def steps(self, config, censored=False):
+        '''
+        finished runs for a config as an (n, 2) array of [trial, steps],
+        sorted by trial. runs that were cut short are left out unless
+        censored is True, in which case they count as the steps they got to
+        '''
+        rows = [(e["trial"], e["steps"]) for e in self.runs(config)
+                if e["steps"] is not None and (censored or e.get("censored") is None)]
+        if len(rows) == 0:
+            return np.zeros((0, 2), dtype=np.int64)
+        result = np.array(rows, dtype=np.int64)
+        return result[np.argsort(result[:, 0], kind="stable")]
@@ -0,0 +1,50 @@
+'''
+Checkpoints of a whole HoominWorld.
+
+A checkpoint is the pickled model, zlib compressed, written to a temporary
+file and moved into place so a run killed mid-write leaves the previous
+checkpoint intact. Everything the simulation reads goes in: hoomin state,
+scatterbuffers, friend graphs, both RNGs, the counters, the logger's file
+offsets, and the ScatterMessage id counter, which lives on the class. A
+model loaded from a checkpoint carries on exactly as the original would
+have.
+
+Homes point at the hoomins living in them, and pickle follows those
+references depth first, so on a big city it would recurse once per
+hoomin. Occupants are stored as unique_ids instead and linked back up
+once the whole model has been loaded.
+'''
+
+import os
+import pickle
+import zlib
+
+
+CHECKPOINTFILENAME = "checkpoint"
+
+MAGIC = b"HOOMINCKPT1\n"
+
+
+def save_checkpoint(model, path):
+    from realhoomin.agents import ScatterMessage
+
+    data = pickle.dumps((ScatterMessage._currentid, model), protocol=pickle.HIGHEST_PROTOCOL)
+    tmp = path + ".tmp"
+    with open(tmp, 'wb') as f:
+        f.write(MAGIC)
+        f.write(zlib.compress(data, 6))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def load_checkpoint(path):
+    from realhoomin.agents import ScatterMessage
+
+    with open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(path + " isn't a HoominWorld checkpoint")
+        data = zlib.decompress(f.read())
+    currentid, model = pickle.loads(data)
+    ScatterMessage._currentid = currentid
+    return model
@@ -0,0 +1,171 @@
+'''
+Per-run configuration for HoominWorld.
+
+settings.py still holds the defaults, but a model only ever reads the
+HoominConfig it was built with, so differently configured models can live
+in the same process and a config can be pickled over to worker processes.
+'''
+
+from dataclasses import dataclass, fields, replace
+import settings
+from realhoomin.dtn import PROTOCOLS
+from realhoomin.metrics import METRICS
+
+
+@dataclass(frozen=True)
+class HoominConfig:
+    runheadless: bool
+
+    #grid options
+    height: int
+    width: int
+
+    #hoomin generation tuning options
+    initial_hoomins: int
+    initial_scattermessages: int
+    agentstate: str
+    engine: str
+    recordcontacts: bool
+    contacttrace: str
+
+    #road generation tuning
+    straightweight: float
+    leftweight: float
+    rightweight: float
+    initial_roads: int
+    initial_road_seeds: int
+    gridspacing: int
+
+    #home generation tuning options
+    homes_per_hoomins: int
+
+    #radio tuning options
+    bluetooth_range: int
+    batchcontacts: bool
+    snapshotcontacts: bool
+
+    #called as scatterfunction(hoomin, otherhoomin) for every exchange and
+    #hoomininit(hoomin) when a hoomin is created
+    scatterfunction: object
+    hoomininit: object
+
+    #friend graph knowledge, see realhoomin/friendbits.py
+    friendexchange: str
+    friendbudget: int
+
+    #message routing, see realhoomin/dtn.py
+    routingprotocol: str
+    contactbandwidth: int
+    spraycopies: int
+    prophetpinit: float
+    prophetbeta: float
+    prophetgamma: float
+
+    #run budgets
+    maxsteps: int
+    maxseconds: float
+    stallsteps: int
+    checkpointinterval: int
+
+    #per-step metrics, see realhoomin/metrics.py
+    metrics: tuple
+    metricsinterval: int
+    metricscapacity: int
+
+    #visualization / performance options
+    profile: bool
+    displayfriendgraph: bool
+    graphrefreshfreq: int
+    logbuffered: bool
+    logflushlines: int
+    logflushinterval: float
+    logthreaded: bool
+    traceformat: str
+
+    #social hoomin tuning options
+    socialswitchprobability: float
+    randomswitchprobability: float
+    friendsperhoomin: int
+    socialrouting: str
+    routecachesize: int
+
+    def __post_init__(self):
+        for name in ("height", "width", "initial_hoomins", "initial_roads", "gridspacing",
+                     "graphrefreshfreq", "logflushlines", "routecachesize",
+                     "metricsinterval", "metricscapacity"):
+            if getattr(self, name) <= 0:
+                raise ValueError(name + " must be positive, got " + str(getattr(self, name)))
+
+        for name in ("initial_scattermessages", "initial_road_seeds", "homes_per_hoomins",
+                     "bluetooth_range", "friendsperhoomin", "logflushinterval", "contactbandwidth",
+                     "friendbudget", "maxsteps", "maxseconds", "stallsteps", "checkpointinterval"):
+            if getattr(self, name) < 0:
+                raise ValueError(name + " can't be negative, got " + str(getattr(self, name)))
+
+        for name in ("straightweight", "leftweight", "rightweight",
+                     "socialswitchprobability", "randomswitchprobability",
+                     "prophetpinit", "prophetbeta", "prophetgamma"):
+            if not 0.0 <= getattr(self, name) <= 1.0:
+                raise ValueError(name + " must be between 0 and 1, got " + str(getattr(self, name)))
+
+        if self.initial_hoomins < 2:
+            raise ValueError("need at least two hoomins to have a hoomin zero and a final hoomin")
+
+        if self.friendsperhoomin >= self.initial_hoomins:
+            raise ValueError("friendsperhoomin must be smaller than initial_hoomins")
+
+        if self.agentstate not in ("objects", "arrays"):
+            raise ValueError("agentstate must be objects or arrays, got " + str(self.agentstate))
+
+        if self.engine not in ("agents", "vectorized", "replay"):
+            raise ValueError("engine must be agents, vectorized or replay, got " + str(self.engine))
+
+        if self.engine == "replay" and not self.contacttrace:
+            raise ValueError("the replay engine needs a contacttrace to replay")
+
+        if self.engine == "vectorized" and self.agentstate != "arrays":
+            raise ValueError("the vectorized engine needs agentstate = arrays")
+
+        if self.traceformat not in ("text", "npy", "both"):
+            raise ValueError("traceformat must be text, npy or both, got " + str(self.traceformat))
+
+        if self.socialrouting not in ("random", "shortestpath"):
+            raise ValueError("socialrouting must be random or shortestpath, got " + str(self.socialrouting))
+
+        if self.friendexchange not in ("friends", "merge"):
+            raise ValueError("friendexchange must be friends or merge, got " + str(self.friendexchange))
+
+        if self.routingprotocol not in PROTOCOLS:
+            raise ValueError("routingprotocol must be one of " + ", ".join(PROTOCOLS) + ", got " + str(self.routingprotocol))
+
+        for name in self.metrics:
+            if name not in METRICS:
+                raise ValueError("unknown metric " + str(name) + ", pick from " + ", ".join(METRICS))
+
+        if self.spraycopies < 1:
+            raise ValueError("spraycopies must be at least 1, got " + str(self.spraycopies))
+
+        if not callable(self.scatterfunction) or not callable(self.hoomininit):
+            raise ValueError("scatterfunction and hoomininit must be callable")
+
+    @property
+    def initial_homes(self):
+        return self.homes_per_hoomins * self.initial_hoomins
+
+    @staticmethod
+    def from_settings(**overrides):
+        '''
+        builds a config from the current values in settings.py, with any
+        keyword arguments taking precedence
+        '''
+        values = {}
+        for f in fields(HoominConfig):
+            if f.name == "scatterfunction":
+                values[f.name] = settings.scatterfucntion
+            else:
+                values[f.name] = getattr(settings, f.name)
+        values.update(overrides)
+        return HoominConfig(**values)
+
+    def replace(self, **overrides):
+        return replace(self, **overrides)
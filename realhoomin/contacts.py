@@ -0,0 +1,79 @@
+'''
+Batched contact detection.
+
+Works off the position arrays HoominGrid mirrors for every hoomin, so
+finding who is in radio range is a few numpy operations instead of a
+python loop over neighborhood cells. Contacts follow the same rules as
+HoominGrid.get_hoomins_in_range: manhattan distance on the grid, and the
+center cell only counts once the neighborhood wraps around the torus.
+'''
+
+import numpy as np
+
+
+#rows compared against the whole population at once when looking for
+#every pair, keeps the distance matrix for big populations bounded
+CHUNKSIZE = 1024
+
+
+def _keepcenter(grid, radius):
+    return grid.torus and (radius >= grid.width or radius >= grid.height)
+
+
+def distances(grid, positions):
+    '''
+    manhattan distance on the grid from every row of positions to every
+    slot in the grid, shape (len(positions), slots)
+    '''
+    n = len(grid.slothoomins)
+    others = grid.positions[:n]
+    dx = np.abs(positions[:, 0, None] - others[None, :, 0])
+    dy = np.abs(positions[:, 1, None] - others[None, :, 1])
+    if grid.torus:
+        dx = np.minimum(dx, grid.width - dx)
+        dy = np.minimum(dy, grid.height - dy)
+    return dx + dy
+
+
+def contacts_for(grid, hoomin, radius):
+    '''
+    hoomins in radio range of a single hoomin, from wherever everybody is
+    right now
+    '''
+    slot = grid.hoominslots[hoomin]
+    d = distances(grid, grid.positions[slot:slot + 1])[0]
+    mask = d <= radius
+    if not _keepcenter(grid, radius):
+        mask &= d > 0
+    mask &= grid.present[:len(d)]
+    return [grid.slothoomins[x] for x in np.flatnonzero(mask).tolist()]
+
+
+def contact_pairs(grid, hoomins, radii):
+    '''
+    every (sender, receiver) pair in one pass over a snapshot of the
+    positions. hoomins is the list of senders, radii their ranges.
+
+    returns two index lists: the position of the sender in hoomins, and the
+    grid slot of the receiver, grouped by sender in the order given
+    '''
+    slots = np.array([grid.hoominslots[h] for h in hoomins], dtype=np.int64)
+    radii = np.asarray(radii, dtype=np.int64)
+    n = len(grid.slothoomins)
+    present = grid.present[:n]
+    keep = np.array([_keepcenter(grid, r) for r in radii.tolist()], dtype=bool)
+
+    senders = []
+    receivers = []
+    for start in range(0, len(slots), CHUNKSIZE):
+        rows = slots[start:start + CHUNKSIZE]
+        r = radii[start:start + CHUNKSIZE, None]
+        d = distances(grid, grid.positions[rows])
+        mask = (d <= r) & ((d > 0) | keep[start:start + CHUNKSIZE, None]) & present[None, :]
+        s, t = np.nonzero(mask)
+        senders.append(s + start)
+        receivers.append(t)
+
+    if len(senders) == 0:
+        return [], []
+    return np.concatenate(senders).tolist(), np.concatenate(receivers).tolist()
@@ -0,0 +1,100 @@
+'''
+Recorded contact traces.
+
+Where hoomins walk doesn't depend on how messages are routed, so a run
+can write down every contact it makes (step, sender, receiver) once, and
+later runs can replay that file with the "replay" engine: no movement, no
+range queries, just the exchanges. Every routing protocol replayed from
+the same file sees exactly the same contacts.
+
+Hoomins are stored by unique_id, so the replaying model has to be built
+the same way as the recording one: the same seed, or the same
+WorldLayout. That holds for traces from either engine.
+'''
+
+import numpy as np
+
+
+CONTACTFILENAME = "contacts.npy"
+
+CONTACTDTYPE = np.dtype([("step", np.int32),
+                         ("sender", np.int32),
+                         ("receiver", np.int32)])
+
+
+class ContactTrace:
+    '''
+    growable array of contacts in the order they happened
+    '''
+
+    def __init__(self, capacity=4096):
+        self.data = np.zeros(max(1, capacity), dtype=CONTACTDTYPE)
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def _reserve(self, n):
+        if self.size + n > len(self.data):
+            grown = np.zeros(max(len(self.data), n), dtype=CONTACTDTYPE)
+            self.data = np.concatenate((self.data, grown))
+
+    def add(self, step, sender, receiver):
+        self._reserve(1)
+        self.data[self.size] = (step, sender, receiver)
+        self.size += 1
+
+    #receivers is a list of unique_ids, all from one step. senders is
+    #either a list the same length or a single unique_id
+    def extend(self, step, senders, receivers):
+        n = len(receivers)
+        self._reserve(n)
+        rows = self.data[self.size:self.size + n]
+        rows["step"] = step
+        rows["sender"] = senders
+        rows["receiver"] = receivers
+        self.size += n
+
+    @property
+    def rows(self):
+        return self.data[:self.size]
+
+    def save(self, path):
+        np.save(path, self.rows)
+
+
+def load_contacts(path, mmap=True):
+    return np.load(path, mmap_mode="r" if mmap else None)
+
+
+class ContactReplay:
+    '''
+    steps through a recorded trace, handing each step's contacts to
+    send_blockdata in the order they were recorded
+    '''
+
+    def __init__(self, contacts):
+        self.senders = np.asarray(contacts["sender"], dtype=np.int64)
+        self.receivers = np.asarray(contacts["receiver"], dtype=np.int64)
+        steps = np.asarray(contacts["step"], dtype=np.int64)
+        if len(steps) > 1 and (np.diff(steps) < 0).any():
+            raise ValueError("contact trace isn't in step order")
+
+        self.laststep = int(steps[-1]) if len(steps) > 0 else -1
+        #contacts for step s are starts[s]:starts[s + 1]
+        self.starts = np.searchsorted(steps, np.arange(self.laststep + 2))
+
+    @staticmethod
+    def load(path):
+        return ContactReplay(load_contacts(path, mmap=False))
+
+    def exhausted(self, step):
+        return step > self.laststep
+
+    def exchange(self, model, step):
+        if self.exhausted(step):
+            return
+        agents = model.schedule._agents
+        lo, hi = self.starts[step], self.starts[step + 1]
+        for s, r in zip(self.senders[lo:hi].tolist(), self.receivers[lo:hi].tolist()):
+            agents[s].send_blockdata(agents[r])
@@ -0,0 +1,251 @@
+'''
+Routing protocols for the scattermessages.
+
+Every contact goes through the model's RoutingProtocol: on_contact(sender,
+receiver) picks which of the sender's messages the receiver gets and hands
+them over, and on_step(step) runs once at the start of every model step
+for protocols whose state changes with time. Every message is headed for
+the final hoomin, so that's the destination the protocols route toward.
+
+contactbandwidth caps how many messages move per contact (0 for no cap).
+Protocols that compare buffers use summary vectors, the sorted message ids
+each ScatterBuffer keeps around, so working out what the receiver is
+missing is one numpy call instead of a membership test per message.
+'''
+
+import numpy as np
+
+
+def missing(sender, receiver):
+    '''
+    ids of the messages sender has and receiver doesn't, oldest first
+    '''
+    have = sender.scatterbuffer.summary()
+    want = receiver.scatterbuffer.summary()
+    if len(have) == 0 or len(want) == 0:
+        return have
+    return have[~np.isin(have, want, assume_unique=True)]
+
+
+def missing_messages(sender, receiver, limit=None):
+    ids = missing(sender, receiver)
+    if limit is not None:
+        ids = ids[:limit]
+    byid = sender.scatterbuffer.byid
+    return [byid[x] for x in ids.tolist()]
+
+
+class RoutingProtocol:
+
+    name = None
+
+    def __init__(self, model):
+        self.model = model
+        self.bandwidth = model.config.contactbandwidth
+        self.now = 0
+
+    @property
+    def destination(self):
+        return self.model.final_hoomin_id
+
+    #how many messages can go over one contact out of n candidates
+    def limit(self, n):
+        if self.bandwidth == 0:
+            return n
+        return min(n, self.bandwidth)
+
+    def on_step(self, step):
+        self.now = step
+
+    def on_contact(self, sender, receiver):
+        return self.deliver(sender, receiver, self.select(sender, receiver))
+
+    #the messages sender passes to receiver on this contact
+    def select(self, sender, receiver):
+        raise NotImplementedError
+
+    #hands messages over and keeps the model's counters, returns how many
+    #the receiver didn't have yet
+    def deliver(self, sender, receiver, messages):
+        if len(messages) == 0:
+            return 0
+        counter = receiver.scatterbuffer.merge(messages)
+        if receiver.unique_id == self.destination:
+            self.model.total_scattermessages += counter
+        self.model.global_scattermessages += counter
+        return counter
+
+
+class Scatter(RoutingProtocol):
+    '''
+    the original exchange: a random sample of the sender's buffer, whether
+    the receiver has those messages or not
+    '''
+
+    name = "scatter"
+
+    def select(self, sender, receiver):
+        return sender.scatterbuffer.sample(sender.random, self.limit(len(sender.scatterbuffer)))
+
+
+class Epidemic(RoutingProtocol):
+    '''
+    everything the receiver is missing, oldest messages first
+    '''
+
+    name = "epidemic"
+
+    def select(self, sender, receiver):
+        if len(sender.scatterbuffer) == 0:
+            return []
+        return missing_messages(sender, receiver, self.limit(len(sender.scatterbuffer)))
+
+
+class SprayAndWait(RoutingProtocol):
+    '''
+    binary spray and wait. a message starts out with spraycopies copies at
+    whoever created it, a carrier with more than one copy gives half of
+    them to the hoomins it meets, and a carrier down to its last copy only
+    hands it to the destination
+    '''
+
+    name = "sprayandwait"
+
+    def __init__(self, model):
+        super().__init__(model)
+        self.spraycopies = model.config.spraycopies
+        #(hoomin id, message id) -> copies that hoomin is holding
+        self.copies = {}
+
+    def select(self, sender, receiver):
+        if len(sender.scatterbuffer) == 0:
+            return []
+        limit = self.limit(len(sender.scatterbuffer))
+        if receiver.unique_id == self.destination:
+            return missing_messages(sender, receiver, limit)
+
+        byid = sender.scatterbuffer.byid
+        result = []
+        for x in missing(sender, receiver).tolist():
+            if self.copies.get((sender.unique_id, x), self.spraycopies) > 1:
+                result.append(byid[x])
+                if len(result) == limit:
+                    break
+        return result
+
+    def on_contact(self, sender, receiver):
+        messages = self.select(sender, receiver)
+        for message in messages:
+            if receiver.unique_id == self.destination:
+                #delivered, the destination doesn't spray it any further
+                self.copies[(receiver.unique_id, message.id)] = 1
+                continue
+            n = self.copies.get((sender.unique_id, message.id), self.spraycopies)
+            self.copies[(receiver.unique_id, message.id)] = n // 2
+            self.copies[(sender.unique_id, message.id)] = n - n // 2
+        return self.deliver(sender, receiver, messages)
+
+
+class Prophet(RoutingProtocol):
+    '''
+    PRoPHET: hoomins keep delivery predictabilities for each other that go
+    up when they meet, pass along transitively, and decay with time. the
+    sender forwards when the receiver is more likely to reach the
+    destination than it is
+    '''
+
+    name = "prophet"
+
+    def __init__(self, model):
+        super().__init__(model)
+        self.pinit = model.config.prophetpinit
+        self.beta = model.config.prophetbeta
+        self.gamma = model.config.prophetgamma
+
+        #every message is headed for the same hoomin, so the only
+        #predictabilities forwarding ever looks at are toward it. each
+        #hoomin keeps that one, and the ones for hoomins it has met, which
+        #feed it transitively. values are stored with the step they were
+        #last aged at and aged when they're next read
+        self.index = {uid: i for i, uid in enumerate(model.schedule._agents)}
+        n = len(self.index)
+        self.todest = np.zeros(n)
+        self.todestaged = np.zeros(n, dtype=np.int64)
+        #hoomin -> {hoomin it met : (predictability, step aged at)}
+        self.met = {}
+
+    def aged(self, value, since):
+        k = self.now - since
+        if k > 0:
+            return value * self.gamma ** k
+        return value
+
+    def dest(self, i):
+        return self.aged(self.todest[i], self.todestaged[i])
+
+    def setdest(self, i, value):
+        self.todest[i] = value
+        self.todestaged[i] = self.now
+
+    def encounter(self, i, j):
+        d = self.index[self.destination]
+        if j == d:
+            pid = self.dest(i)
+            self.setdest(i, pid + (1.0 - pid) * self.pinit)
+            return
+
+        met = self.met.setdefault(i, {})
+        value, since = met.get(j, (0.0, self.now))
+        pij = self.aged(value, since)
+        pij += (1.0 - pij) * self.pinit
+        met[j] = (pij, self.now)
+
+        #transitivity: i can reach the destination through j, a bit less
+        #reliably. the destination's predictability for itself stays 0
+        if i != d:
+            pid = self.dest(i)
+            self.setdest(i, pid + (1.0 - pid) * pij * self.dest(j) * self.beta)
+
+    def on_contact(self, sender, receiver):
+        self.encounter(self.index[sender.unique_id], self.index[receiver.unique_id])
+        return super().on_contact(sender, receiver)
+
+    def select(self, sender, receiver):
+        if len(sender.scatterbuffer) == 0:
+            return []
+        if receiver.unique_id != self.destination:
+            i = self.index[sender.unique_id]
+            j = self.index[receiver.unique_id]
+            if self.dest(j) <= self.dest(i):
+                return []
+        return missing_messages(sender, receiver, self.limit(len(sender.scatterbuffer)))
+
+
+class Friendship(RoutingProtocol):
+    '''
+    forwards only to the destination and the destination's friends, who
+    are the hoomins most likely to run into it
+    '''
+
+    name = "friendship"
+
+    def __init__(self, model):
+        super().__init__(model)
+        self.friends = None
+
+    def select(self, sender, receiver):
+        if len(sender.scatterbuffer) == 0:
+            return []
+        if self.friends is None:
+            destination = self.model.schedule._agents[self.destination]
+            self.friends = set(h.unique_id for h in self.model.G.neighbors(destination))
+        if receiver.unique_id != self.destination and receiver.unique_id not in self.friends:
+            return []
+        return missing_messages(sender, receiver, self.limit(len(sender.scatterbuffer)))
+
+
+PROTOCOLS = {p.name: p for p in (Scatter, Epidemic, SprayAndWait, Prophet, Friendship)}
+
+
+def make_protocol(model):
+    return PROTOCOLS[model.config.routingprotocol](model)
@@ -0,0 +1,79 @@
+'''
+Friend graph knowledge as bitsets.
+
+Every hoomin in model.G gets a node index and every friendship an edge
+index, in the order they're made. What a hoomin knows about the friend
+graph is then two ints used as bitsets, known nodes and known edges, and
+learning another hoomin and its friendships is two ORs instead of a
+networkx graph per hoomin growing one has_node/has_edge at a time.
+Merging in everything another hoomin knows is the same two ORs on its
+known bitsets, however much that is.
+
+A known graph is only turned back into networkx for drawing it.
+'''
+
+import networkx as nx
+
+
+try:
+    popcount = int.bit_count
+except AttributeError:
+    def popcount(bits):
+        return bin(bits).count("1")
+
+
+#indexes of the set bits, lowest first
+def setbits(bits):
+    while bits:
+        low = bits & -bits
+        yield low.bit_length() - 1
+        bits ^= low
+
+
+#the bits of bits in a window width wide starting at its lowest set bit,
+#what fits in one budget-limited send of a bitset
+def window(bits, width):
+    if bits == 0:
+        return 0
+    start = (bits & -bits).bit_length() - 1
+    return bits & (((1 << width) - 1) << start)
+
+
+class FriendIndex:
+
+    def __init__(self):
+        #unique_ids by node index, unique_id pairs by edge index
+        self.nodes = []
+        self.edges = []
+        self.nodeindex = {}
+        self.edgeindex = {}
+
+    def nodebit(self, hoominid):
+        i = self.nodeindex.get(hoominid)
+        if i is None:
+            i = len(self.nodes)
+            self.nodes.append(hoominid)
+            self.nodeindex[hoominid] = i
+        return 1 << i
+
+    #friendships go both ways, so a and b are the same edge as b and a
+    def edgebit(self, a, b):
+        key = (a, b) if a < b else (b, a)
+        i = self.edgeindex.get(key)
+        if i is None:
+            i = len(self.edges)
+            self.edges.append(key)
+            self.edgeindex[key] = i
+        return 1 << i
+
+    def graph(self, agents, nodebits, edgebits):
+        '''
+        the known nodes and edges as a networkx graph of hoomins, with the
+        same agent node attribute as model.G
+        '''
+        graph = nx.Graph()
+        for i in setbits(nodebits):
+            hoomin = agents[self.nodes[i]]
+            graph.add_node(hoomin, agent=[hoomin])
+        graph.add_edges_from((agents[a], agents[b]) for a, b in (self.edges[i] for i in setbits(edgebits)))
+        return graph
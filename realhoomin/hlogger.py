@@ -1,29 +1,102 @@
+import atexit
 import os
+import queue
 import sys
+import threading
+import time
+import weakref
+
+
+#every buffered logger still alive, so whatever is left in the buffers
+#makes it to disk when the interpreter exits
+_loggers = weakref.WeakSet()
+
+def _flush_loggers():
+    for logger in list(_loggers):
+        logger.closeall()
+
+atexit.register(_flush_loggers)
 
 
 class Logging:
 
-    def __init__(self, logdir, runtag):
-        if not os.path.exists(logdir + '/' + runtag):
-            os.makedirs(logdir + '/' + runtag)
+    '''
+    Writes log files under logdir/runtag.
 
+    By default every write goes straight to disk. With buffered=True lines
+    are held in memory and written out once flushlines lines have piled up
+    for a file or flushinterval seconds have passed since the last flush,
+    and with threaded=True the actual writes happen on a background thread.
+    '''
+
+    def __init__(self, logdir, runtag, buffered=False, flushlines=1000, flushinterval=5.0, threaded=False):
         self.logdir = logdir
         self.runtag = runtag
         self.inited = True
         self.files = {}
 
+        self.buffered = buffered
+        self.flushlines = flushlines
+        self.flushinterval = flushinterval
+        self.buffers = {}
+        self.lastflush = time.monotonic()
+
+        self.threaded = buffered and threaded
+        self.queue = None
+        self.writer = None
+
+        if self.buffered:
+            _loggers.add(self)
+
+    #open files are stored as how far into them the run had written, and
+    #reopened there on load. anything written after that point (by a run
+    #that went on past its last checkpoint) is cut off
+    def __getstate__(self):
+        for filename in self.files:
+            self.flush(filename)
+        if self.queue is not None:
+            self.queue.join()
+
+        state = self.__dict__.copy()
+        state["files"] = {filename: f.tell() for filename, f in self.files.items() if not f.closed}
+        state["buffers"] = {filename: [] for filename in state["files"]}
+        state["queue"] = None
+        state["writer"] = None
+        return state
+
+    def __setstate__(self, state):
+        offsets = state["files"]
+        self.__dict__.update(state)
+        self.files = {}
+        for filename, offset in offsets.items():
+            p = self.path(filename)
+            f = open(p, 'r+' if os.path.exists(p) else 'w')
+            f.truncate(offset)
+            f.seek(offset)
+            self.files[filename] = f
+        self.lastflush = time.monotonic()
+        if self.buffered:
+            _loggers.add(self)
+
+    #where filename goes, making the run directory the first time it's needed
+    def path(self, filename):
+        d = self.logdir + '/' + self.runtag
+        if not os.path.exists(d):
+            os.makedirs(d)
+        return d + '/' + filename
+
     def open(self, filename, overwrite=False):
         if self.inited:
-            p = self.logdir + '/' + self.runtag  + '/' + filename
+            p = self.path(filename)
             if os.path.exists(p) and not overwrite:
                 return False
 
             if filename in self.files and not overwrite:
                 return False
             elif filename in self.files:
-                self.files[filename].close()
+                self.close(filename)
             self.files[filename] = open(p, 'w')
+            self.buffers[filename] = []
             return True
         else:
             return False
@@ -47,10 +120,22 @@ class Logging:
         if self.files[filename].closed:
             return False
 
+        self.flush(filename)
+        if self.queue is not None:
+            self.queue.join()
         self.files[filename].close()
 
         return True
 
+    def closeall(self):
+        for filename in list(self.files):
+            self.close(filename)
+        if self.writer is not None:
+            self.queue.put(None)
+            self.writer.join()
+            self.writer = None
+            self.queue = None
+
     def write(self, filename, data):
         if filename not in self.files:
             return False
@@ -58,6 +143,59 @@ class Logging:
         if self.files[filename].closed:
             return False
 
-        self.files[filename].write(str(data) + '\n')
-        self.files[filename].flush()
+        if not self.buffered:
+            self.files[filename].write(str(data) + '\n')
+            self.files[filename].flush()
+            return True
+
+        buf = self.buffers[filename]
+        buf.append(str(data))
+        if len(buf) >= self.flushlines:
+            self.flush(filename)
+        elif time.monotonic() - self.lastflush >= self.flushinterval:
+            self.flushall()
+        return True
+
+    #writes out whatever is buffered for one file
+    def flush(self, filename):
+        if filename not in self.files or self.files[filename].closed:
+            return False
+
+        buf = self.buffers[filename]
+        if len(buf) > 0:
+            text = '\n'.join(buf) + '\n'
+            self.buffers[filename] = []
+            if self.threaded:
+                self._enqueue(self.files[filename], text)
+            else:
+                self.files[filename].write(text)
+                self.files[filename].flush()
+
+        self.lastflush = time.monotonic()
         return True
+
+    def flushall(self):
+        for filename in self.files:
+            self.flush(filename)
+
+    def _enqueue(self, f, text):
+        if self.writer is None:
+            self.queue = queue.Queue()
+            self.writer = threading.Thread(target=self._writeloop, args=(self.queue,), daemon=True)
+            self.writer.start()
+        self.queue.put((f, text))
+
+    @staticmethod
+    def _writeloop(q):
+        while True:
+            item = q.get()
+            if item is None:
+                q.task_done()
+                return
+            f, text = item
+            try:
+                f.write(text)
+                f.flush()
+            except (OSError, ValueError) as e:
+                print("log writer failed: ", e, file=sys.stderr)
+            q.task_done()
@@ -0,0 +1,134 @@
+'''
+Vectorized movement for array-backed SocialHoomins.
+
+move_hoomins does what SocialHoomin.step does for every hoomin in one
+pass over the HoominState columns: heading home or to a friend, walking
+to the nearest road, wandering the road network, and the mode switches.
+Everybody decides from where they were at the start of the step, and
+exchanges happen afterwards from a snapshot of where everyone ended up,
+so this matches the per-agent engine with snapshotcontacts on, in
+distribution rather than draw for draw.
+'''
+
+import numpy as np
+
+from realhoomin.agents import SocialHoomin
+
+
+def friend_slots(model):
+    '''
+    friend lists as a table of state slots, padded with -1, plus how many
+    friends each slot has. friends don't change, so it's built once
+    '''
+    state = model.agentstate
+    if getattr(model, "friendslots", None) is not None and len(model.friendslots) == state.size:
+        return model.friendslots, model.friendcounts
+
+    slotof = {}
+    for slot in range(state.size):
+        slotof[int(state.ids[slot])] = slot
+
+    counts = np.zeros(state.size, dtype=np.int64)
+    for h in state.hoomins:
+        counts[h.slot] = len(h.friendlist) if h.friendlist is not None else 0
+
+    table = np.full((state.size, max(1, int(counts.max(initial=0)))), -1, dtype=np.int64)
+    for h in state.hoomins:
+        for j, f in enumerate(h.friendlist or ()):
+            table[h.slot, j] = slotof[f]
+
+    model.friendslots = table
+    model.friendcounts = counts
+    return table, counts
+
+
+def move_hoomins(model, hoomins):
+    state = model.agentstate
+    rm = model.roadmap
+    rng = model.nprandom
+    config = model.config
+
+    n = len(hoomins)
+    slots = np.array([h.slot for h in hoomins], dtype=np.int64)
+    pos = state.pos[slots]
+    newpos = pos.copy()
+    mode = state.mode[slots]
+    onroad = state.onroad[slots]
+    seeking0 = state.seekingroad[slots]
+    seeking = seeking0.copy()
+    dst = state.dst[slots]
+    hasdst = state.hasdst[slots]
+
+    social = mode == SocialHoomin.MODE_SOCIALIZE
+    wander = np.zeros(n, dtype=bool)
+
+    #random mode and on the roads: head home, which in practice means
+    #wandering, random_pathfind doesn't look at dst
+    home = ~social & onroad & state.hashome[slots]
+    dst[home] = state.home[slots[home]]
+    hasdst |= home
+    wander |= ~social & onroad & ~seeking0
+
+    #random mode and off the roads: pick the nearest road, then walk to it
+    find = np.flatnonzero(~social & ~onroad & ~seeking0)
+    near = rm.nearest[pos[find, 0], pos[find, 1]]
+    found = near[:, 0] >= 0
+    find = find[found]
+    seeking[find] = True
+    dst[find] = near[found]
+    hasdst[find] = True
+
+    walk = np.flatnonzero(~social & ~onroad & seeking0 & hasdst)
+    d = dst[walk] - pos[walk]
+    diag = (d[:, 0] != 0) & (d[:, 1] != 0)
+    newpos[walk[diag]] = pos[walk[diag]] + np.sign(d[diag])
+    arrived = walk[~diag]
+    seeking[arrived] = False
+    onroad[arrived] = True
+
+    #socializing: go after a random friend
+    friends, counts = friend_slots(model)
+    nofriends = social & (counts[slots] == 0)
+    mode[nofriends] = SocialHoomin.MODE_RANDOM
+    go = np.flatnonzero(social & ~nofriends)
+    pick = (rng.random(len(go)) * counts[slots[go]]).astype(np.int64)
+    dst[go] = state.pos[friends[slots[go], pick]]
+    hasdst[go] = True
+    go = go[~seeking0[go]]
+    if config.socialrouting == "shortestpath":
+        for i in go.tolist():
+            hop = model.router.next_hop(pos[i], dst[i])
+            if hop is None:
+                wander[i] = True
+            else:
+                newpos[i] = hop
+    else:
+        wander[go] = True
+
+    #one step onto a random road tile next to (or under) the hoomin
+    w = np.flatnonzero(wander)
+    cells = pos[w, 0] * rm.height + pos[w, 1]
+    start = rm.cellroads_indptr[cells]
+    count = rm.cellroads_indptr[cells + 1] - start
+    has = count > 0
+    choice = start[has] + (rng.random(int(has.sum())) * count[has]).astype(np.int64)
+    newpos[w[has]] = rm.roadcells[rm.cellroads_indices[choice]]
+
+    #mode switches, hoomins that just found out they have no friends skip it
+    u = rng.random(n)
+    roll = ~nofriends
+    tosocial = roll & (mode == SocialHoomin.MODE_RANDOM) & (u < config.socialswitchprobability)
+    torandom = roll & (mode == SocialHoomin.MODE_SOCIALIZE) & (u < config.randomswitchprobability)
+    mode[tosocial] = SocialHoomin.MODE_SOCIALIZE
+    mode[torandom] = SocialHoomin.MODE_RANDOM
+
+    state.mode[slots] = mode
+    state.onroad[slots] = onroad
+    state.seekingroad[slots] = seeking
+    state.dst[slots] = dst
+    state.hasdst[slots] = hasdst
+
+    moved = np.flatnonzero((newpos != pos).any(axis=1))
+    grid = model.grid
+    for i, p in zip(moved.tolist(), newpos[moved].tolist()):
+        grid.move_agent(hoomins[i], (p[0], p[1]))
@@ -0,0 +1,74 @@
+'''
+Saved city layouts.
+
+A WorldLayout is everything HoominWorld generates before the simulation
+starts: where the roads and homes are, where each hoomin starts, which
+home it lives in, and who its friends are. Generate one from a seed, save
+it, and every model built from it gets the same city, so sweeps over
+radio range or switch probabilities compare like with like and skip
+world generation.
+'''
+
+import numpy as np
+
+
+class WorldLayout:
+
+    def __init__(self, width, height, roads, homes, spawns, homeof, friends, seed=None):
+        self.width = int(width)
+        self.height = int(height)
+        #road tiles in the order they were placed, repeats included
+        self.roads = np.asarray(roads, dtype=np.int64).reshape(-1, 2)
+        self.homes = np.asarray(homes, dtype=np.int64).reshape(-1, 2)
+        #starting position of every hoomin, in creation order
+        self.spawns = np.asarray(spawns, dtype=np.int64).reshape(-1, 2)
+        #index into homes for each hoomin, -1 if homeless
+        self.homeof = np.asarray(homeof, dtype=np.int64)
+        #indices into spawns of each hoomin's friends, padded with -1
+        self.friends = np.asarray(friends, dtype=np.int64).reshape(len(self.spawns), -1)
+        self.seed = seed
+
+    @property
+    def hoomincount(self):
+        return len(self.spawns)
+
+    @staticmethod
+    def from_world(world):
+        hoomins = world.hoominlist
+        index = {h.unique_id: i for i, h in enumerate(hoomins)}
+        homeindex = {home: i for i, home in enumerate(world.homelist)}
+
+        width = max([len(h.friendlist or ()) for h in hoomins] + [1])
+        friends = np.full((len(hoomins), width), -1, dtype=np.int64)
+        for i, h in enumerate(hoomins):
+            for j, f in enumerate(h.friendlist or ()):
+                friends[i, j] = index[f]
+
+        return WorldLayout(world.width, world.height,
+                           world.roadpositions,
+                           [home.pos for home in world.homelist],
+                           world.spawns,
+                           [homeindex.get(h.home, -1) for h in hoomins],
+                           friends,
+                           world._seed)
+
+    @staticmethod
+    def generate(config, seed):
+        '''
+        builds a world from config and seed and keeps just its layout
+        '''
+        from realhoomin.model import HoominWorld
+        return WorldLayout.from_world(HoominWorld(logtag="layout", seed=seed, config=config))
+
+    def save(self, path):
+        np.savez(path, width=self.width, height=self.height, roads=self.roads, homes=self.homes,
+                 spawns=self.spawns, homeof=self.homeof, friends=self.friends,
+                 seed=np.array(-1 if self.seed is None else self.seed))
+
+    @staticmethod
+    def load(path):
+        with np.load(path) as data:
+            seed = data["seed"].item()
+            return WorldLayout(data["width"], data["height"], data["roads"], data["homes"],
+                               data["spawns"], data["homeof"], data["friends"],
+                               None if seed == -1 else seed)
@@ -0,0 +1,96 @@
+'''
+Sampled per-step metrics.
+
+A MetricsRecorder reads a fixed set of metrics every interval steps into
+a preallocated ring buffer, so a long run keeps the last capacity samples
+instead of a list per metric that grows for the whole run, and steps in
+between samples cost one modulo. mesa's DataCollector is only built for
+runs with a UI, where the charts read from it.
+'''
+
+from operator import attrgetter
+
+import numpy as np
+
+
+METRICSFILENAME = "metrics.npy"
+
+
+def _hoominzero_nodes(model):
+    return model.schedule._agents[model.hoomin_zero_id].knownnodes
+
+
+def _finalhoomin_nodes(model):
+    return model.schedule._agents[model.final_hoomin_id].knownnodes
+
+
+def _final_messages(model):
+    return len(model.schedule._agents[model.final_hoomin_id].scatterbuffer)
+
+
+#every metric that can be recorded, by name. the first two are the ones
+#the server charts
+METRICS = {"Messages Exchanged" : attrgetter("total_scattermessages"),
+           "FriendGraph Node Count" : attrgetter("hoominzero_nodecount"),
+           "Global Messages" : attrgetter("global_scattermessages"),
+           "Hoomin Zero Nodes" : _hoominzero_nodes,
+           "Final Hoomin Nodes" : _finalhoomin_nodes,
+           "Final Hoomin Messages" : _final_messages}
+
+
+class MetricsRecorder:
+
+    def __init__(self, names, interval=1, capacity=4096):
+        self.names = tuple(names)
+        self.functions = [METRICS[name] for name in self.names]
+        self.interval = interval
+        self.capacity = max(1, capacity)
+
+        self.steps = np.zeros(self.capacity, dtype=np.int64)
+        self.values = np.zeros((self.capacity, len(self.names)))
+        #samples taken so far, the newest is at (count - 1) % capacity
+        self.count = 0
+
+    def due(self, step):
+        return step % self.interval == 0
+
+    def sample(self, model, step, force=False):
+        if not force and step % self.interval != 0:
+            return False
+        i = self.count % self.capacity
+        self.steps[i] = step
+        row = self.values[i]
+        for j, f in enumerate(self.functions):
+            row[j] = f(model)
+        self.count += 1
+        return True
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    def _order(self):
+        if self.count <= self.capacity:
+            return np.arange(self.count)
+        start = self.count % self.capacity
+        return np.concatenate((np.arange(start, self.capacity), np.arange(start)))
+
+    def rows(self):
+        '''
+        the samples still in the buffer, oldest first, as a structured array
+        with a step field and one field per metric
+        '''
+        order = self._order()
+        dtype = np.dtype([("step", np.int64)] + [(name, np.float64) for name in self.names])
+        result = np.zeros(len(order), dtype=dtype)
+        result["step"] = self.steps[order]
+        for j, name in enumerate(self.names):
+            result[name] = self.values[order, j]
+        return result
+
+    def latest(self, name):
+        if self.count == 0:
+            return None
+        return self.values[(self.count - 1) % self.capacity, self.names.index(name)]
+
+    def save(self, path):
+        np.save(path, self.rows())
@@ -8,16 +8,29 @@ networks.
 
 
 
+import os
+import time
+
 from mesa import Model
-from mesa.space import MultiGrid
 from mesa.datacollection import DataCollector
 from realhoomin.schedule import RandomHoominActivation
-from realhoomin.agents  import Hoomin, Road, MeetHoomin, FindRoadHoomin, Home, SocialHoomin
+from realhoomin.space import HoominGrid
+from realhoomin.agents  import Hoomin, MeetHoomin, FindRoadHoomin, Home, SocialHoomin
 import numpy as np
 import matplotlib.pyplot as plt
 import networkx as nx
-import settings
+from realhoomin.config import HoominConfig
 from realhoomin.hlogger import Logging
+from realhoomin.trace import StepTrace, save_censored, TRACEFILENAME, CENSOREDFILENAME
+from realhoomin.roads import RoadMap, RoadRouter
+from realhoomin.terrain import Terrain, ROAD, HOME
+from realhoomin.dtn import make_protocol
+from realhoomin.contacttrace import ContactTrace, ContactReplay, CONTACTFILENAME
+from realhoomin.profiling import PhaseTimer, PROFILEFILENAME
+from realhoomin.metrics import METRICS, MetricsRecorder, METRICSFILENAME
+from realhoomin.checkpoint import save_checkpoint, load_checkpoint, CHECKPOINTFILENAME
+from realhoomin.friendbits import FriendIndex
+from realhoomin.agentstate import HoominState, ArraySocialHoomin
 
 
 class HoominWorld(Model):
@@ -35,21 +48,42 @@ class HoominWorld(Model):
     description = "A model of foot traffic and radio communication in an urban environment"
 
 
-    def __init__(self, height=50, width=50, initial_hoomins=10, logtag="default"):
+    def __init__(self, height=50, width=50, initial_hoomins=10, logtag="default", seed=None, config=None, layout=None, logdir="logs"):
         super().__init__()
 
-        print("initializing ", settings.width, settings.height)
+        if config is None:
+            config = HoominConfig.from_settings()
+        self.config = config
+
+        print("initializing ", config.width, config.height)
         #map height and width
-        self.height = settings.height
-        self.width = settings.width
+        self.height = config.height
+        self.width = config.width
 
         #logging framework
-        self.logger = Logging("logs", logtag)
+        self.logger = Logging(logdir, logtag, buffered=config.logbuffered, flushlines=config.logflushlines,
+                              flushinterval=config.logflushinterval, threaded=config.logthreaded)
         self.logtag = logtag
         self.G = nx.Graph()
+        #node and edge indexes of G for the hoomins' known friend bitsets
+        self.friendindex = FriendIndex()
+
+        #per-step metrics
+        self.textlogs = config.traceformat in ("text", "both")
+        self.trace = StepTrace() if config.traceformat in ("npy", "both") else None
+        #step the trace and the other npy outputs were last saved at
+        self.savedlevel = None
+
+        #every contact the run makes, and the recorded contacts to replay
+        #instead of moving anybody
+        self.contacts = ContactTrace() if config.recordcontacts else None
+        self.replay = ContactReplay.load(config.contacttrace) if config.engine == "replay" else None
+
+        #time spent in each phase of a step, None unless profiling
+        self.timer = PhaseTimer() if config.profile else None
 
         #graph visualization
-        if not settings.runheadless:
+        if not config.runheadless:
             plt.ion()
             plt.show()
 
@@ -57,22 +91,39 @@ class HoominWorld(Model):
         self.hoomin_level = 0
 
         #road generation tuning
-        self.straightweight = settings.straightweight
-        self.leftweight = settings.leftweight
-        self.rightweight = settings.rightweight
-        self.initial_roads = settings.initial_roads
-        self.initial_road_seeds = settings.initial_road_seeds
-        self.gridspacing = settings.gridspacing
-        self.roadcurrentcoord = np.array((0,0))
-        self.roaddir = np.array((1,0))
-        self.roadset = set()
+        self.straightweight = config.straightweight
+        self.leftweight = config.leftweight
+        self.rightweight = config.rightweight
+        self.initial_roads = config.initial_roads
+        self.initial_road_seeds = config.initial_road_seeds
+        self.gridspacing = config.gridspacing
+        self.roadcurrentcoord = (0,0)
+        self.roaddir = (1,0)
+        self.roadset = []
 
 
         #home tuning options
-        self.homes_per_hoomins = 1
-        self.initial_homes = self.homes_per_hoomins * initial_hoomins
-        self.homeset = set()
-
+        self.homes_per_hoomins = config.homes_per_hoomins
+        self.initial_homes = config.initial_homes
+        self.claimedhomes = set()
+
+
+        #contact detection
+        self.batchcontacts = config.batchcontacts
+        self.snapshotcontacts = config.snapshotcontacts
+
+        #why the run was cut short, None if it ran to completion (or is
+        #still going)
+        self.censored = None
+        #step the final hoomin got every message at, None until it does
+        self.completedat = None
+        #a recording run keeps going past completion to its step or time
+        #budget, so the trace has contacts for protocols slower than the
+        #one it was recorded with
+        self.recordpast = config.recordcontacts and (config.maxsteps > 0 or config.maxseconds > 0)
+        #last step any of the logged metrics changed, for stallsteps
+        self.lastprogress = 0
+        self.progress = None
 
         #scatterbrain metrics
         self.total_scattermessages = 0
@@ -80,11 +131,60 @@ class HoominWorld(Model):
         self.hoominzero_nodecount = 0
 
         #hoomin tuning values
-        self.initial_hoomins = settings.initial_hoomins
+        self.initial_hoomins = config.initial_hoomins
+        if config.agentstate == "arrays":
+            self.agentstate = HoominState(config.initial_hoomins)
+            hoominclass = ArraySocialHoomin
+        else:
+            self.agentstate = None
+            hoominclass = SocialHoomin
         self.schedule = RandomHoominActivation(self)
-        self.grid = MultiGrid(self.height, self.width, torus=True)
-        self.datacollector = DataCollector({"Messages Exchanged" : lambda m: m.total_scattermessages, "FriendGraph Node Count" : lambda m : m.hoominzero_nodecount})
+        self.grid = HoominGrid(self.height, self.width, torus=True, bucketsize=config.bluetooth_range)
+        #roads and homes, only hoomins go in the grid
+        self.terrain = Terrain(self.grid.width, self.grid.height, self.grid.torus)
+        #headless runs only keep the sampled metrics, mesa's DataCollector
+        #is there for the server's charts
+        if config.runheadless:
+            self.datacollector = None
+        else:
+            self.datacollector = DataCollector({name : METRICS[name] for name in config.metrics})
+        self.metrics = MetricsRecorder(config.metrics, config.metricsinterval, config.metricscapacity)
+
+        #everything placed on the map, in order, so the city can be saved
+        #as a WorldLayout
+        self.roadpositions = []
+        self.homelist = []
+        self.hoominlist = []
+        self.spawns = []
+
+        if layout is None:
+            self.generate_world(hoominclass)
+        else:
+            self.load_layout(layout, hoominclass)
+
+        #sizes of the true friend graph, hoomins are complete once what they
+        #know of it reaches them
+        self.friendnodecount = self.G.number_of_nodes()
+        self.friendedgecount = self.G.number_of_edges()
+
+        #roads are done moving around now
+        self.roadmap = RoadMap.from_terrain(self.terrain)
+        self.router = RoadRouter(self.roadmap, config.routecachesize)
+
+        #the vectorized engine's generator is seeded once the world is
+        #built, so a seed makes the same city under either engine
+        if config.engine == "vectorized":
+            self.nprandom = np.random.default_rng(self.random.getrandbits(64))
+
+        #decides which messages move on every contact
+        self.protocol = make_protocol(self)
+
+        self.running = True
+        if self.datacollector is not None:
+            self.datacollector.collect(self)
+        self.metrics.sample(self, 0)
 
+    def generate_world(self, hoominclass):
         #initialize roads
         for i in range(self.initial_road_seeds):
             x = self.random.randrange(self.width)
@@ -93,111 +193,149 @@ class HoominWorld(Model):
             self.singleroad((x,y))
 
 
-        homelist = []
-
         #initialize homes
         for i in range(self.initial_homes):
-            road = self.random.sample(self.roadset, 1)
-            if len(road) > 0 and road[0] is not None:
-                neighbors = self.grid.get_neighborhood(road[0].pos, False, True)
+            if len(self.roadset) > 0:
+                road = self.roadset[self.random.randrange(len(self.roadset))]
+                neighbors = self.grid.get_neighborhood(road, False, False)
                 for neighbor in neighbors:
-                    n = []
-                    if len(self.grid.get_cell_list_contents(neighbor)) is 0:
-                        n.append(neighbor)
-                    if len(n) > 0:
-                        homeblock = self.random.sample(n, 1)
-                        home = Home(self.next_id(), homeblock[0], self)
-                        homelist.append(home)
-                        self.grid.place_agent(home, homeblock[0])
+                    if self.terrain.isempty(neighbor):
+                        self.placehome(neighbor)
             else:
                 print("systemic oppression under capitalism forclosed on one hoomin's home.")
 
-        self.homeset = self.homeset.union(set(homelist))
-
 
         #initialize hoomins
+        unclaimed = list(self.homelist)
+        myhome = None
         for i in range(self.initial_hoomins):
             x = self.random.randrange(self.width)
             y = self.random.randrange(self.height)
-            hoomin = SocialHoomin(self.next_id(), (x,y), self)
             if i == 1:
-                for x in range(settings.initial_scattermessages):
-                    hoomin.store_scattermessage("hoomin!")
-                hoomin.pos = (0,0)
                 x = 0
                 y = 0
-                self.hoomin_zero_id = hoomin.unique_id
-
             if i == self.initial_hoomins - 1:
-                self.final_hoomin_id = hoomin.unique_id
-                hoomin.pos = (self.width - 1, self.height - 1)
                 x = self.width - 1
                 y = self.height - 1
+            hoomin = self.placehoomin(hoominclass, i, (x,y))
 
-            possiblehomes = self.homeset.difference(Home.claimedhomes)
-            if len(possiblehomes) > 0:
-                myhome = self.random.sample(possiblehomes, 1)
-            if len(myhome) > 0:
-                myhome[0].claim(hoomin)
-            self.grid.place_agent(hoomin, (x,y))
-            self.schedule.add(hoomin)
-            self.G.add_node(hoomin, agent=[hoomin])
+            #once everyone has a home, the rest move in with the last hoomin
+            #that found one
+            if len(unclaimed) > 0:
+                j = self.random.randrange(len(unclaimed))
+                myhome = unclaimed[j]
+                unclaimed[j] = unclaimed[-1]
+                unclaimed.pop()
+            if myhome is not None:
+                myhome.claim(hoomin)
 
 
         #initialize hoomin friends
-        friendlist = set(self.schedule._agents)
-        for i in self.schedule._agents:
-            fren = self.random.sample(friendlist.difference(set([i])), settings.friendsperhoomin)
+        ids = [h.unique_id for h in self.hoominlist]
+        for i, hoomin in enumerate(self.hoominlist):
+            #pick from everyone but i without building a list of everyone
+            fren = self.random.sample(range(len(ids) - 1), self.config.friendsperhoomin)
             for x in fren:
-                self.schedule._agents[i].addfriend(x)
-                self.G.add_edge(self.schedule._agents[i], self.schedule._agents[x])
+                self.makefriends(hoomin, self.hoominlist[x + 1 if x >= i else x])
 
         self.roadplace_grid()
-        self.running = True
-        self.datacollector.collect(self)
+
+    def load_layout(self, layout, hoominclass):
+        if layout.width != self.width or layout.height != self.height:
+            raise ValueError("layout is " + str(layout.width) + "x" + str(layout.height) +
+                             " but the config is " + str(self.width) + "x" + str(self.height))
+        if layout.hoomincount != self.initial_hoomins:
+            raise ValueError("layout has " + str(layout.hoomincount) + " hoomins but the config wants " +
+                             str(self.initial_hoomins))
+
+        for x, y in layout.roads.tolist():
+            self.placeroad((x,y))
+
+        for x, y in layout.homes.tolist():
+            self.placehome((x,y))
+
+        for i, (x, y) in enumerate(layout.spawns.tolist()):
+            hoomin = self.placehoomin(hoominclass, i, (x,y))
+            if layout.homeof[i] >= 0:
+                self.homelist[layout.homeof[i]].claim(hoomin)
+
+        for i, friends in enumerate(layout.friends.tolist()):
+            for x in friends:
+                if x >= 0:
+                    self.makefriends(self.hoominlist[i], self.hoominlist[x])
+
+    def placeroad(self, pos):
+        self.terrain.place(pos, ROAD)
+        self.roadpositions.append(pos)
+        return pos
+
+    def placehome(self, pos):
+        home = Home(pos, self)
+        self.terrain.place(pos, HOME)
+        self.homelist.append(home)
+        return home
+
+    #hoomin 1 is hoomin zero and starts out with all the messages, the last
+    #hoomin is the one they're trying to reach
+    def placehoomin(self, hoominclass, i, pos):
+        hoomin = hoominclass(self.next_id(), pos, self)
+        if i == 1:
+            for x in range(self.config.initial_scattermessages):
+                hoomin.store_scattermessage("hoomin!")
+            self.hoomin_zero_id = hoomin.unique_id
+        if i == self.initial_hoomins - 1:
+            self.final_hoomin_id = hoomin.unique_id
+
+        self.grid.place_agent(hoomin, pos)
+        self.schedule.add(hoomin)
+        self.G.add_node(hoomin, agent=[hoomin])
+        hoomin.nodebit = self.friendindex.nodebit(hoomin.unique_id)
+        self.hoominlist.append(hoomin)
+        self.spawns.append(pos)
+        return hoomin
+
+    def makefriends(self, hoomin, friend):
+        hoomin.addfriend(friend.unique_id)
+        self.G.add_edge(hoomin, friend)
 
     def roadplace_grid(self):
         for h in range(self.height):
-            if h % self.gridspacing is 0:
+            if h % self.gridspacing == 0:
                 for w in range(self.width):
-                    road = Road(self.next_id(), (w,h), self)
-                    self.grid.place_agent(road, (w,h))
+                    self.placeroad((w,h))
 
         for w in range(self.width):
-            if w % self.gridspacing is 0:
+            if w % self.gridspacing == 0:
                 for h in range(self.height):
-                    road = Road(self.next_id(), (w,h), self)
-                    self.grid.place_agent(road, (w,h))
+                    self.placeroad((w,h))
 
 
 
 
     def roadplace_random(self, direction=0):
 
+        dx, dy = self.roaddir
         if direction is HoominWorld.STRAIGHT:
             True
         elif direction is HoominWorld.LEFT:
-            self.roaddir = np.array((-1 * self.roaddir[1], self.roaddir[0]))
+            self.roaddir = (-1 * dy, dx)
         elif direction is HoominWorld.RIGHT:
-            self.roaddir = np.array((self.roaddir[1], -1 * self.roaddir[0]))
+            self.roaddir = (dy, -1 * dx)
         else:
-            self.roaddir = np.array((0,0))
+            self.roaddir = (0,0)
             print("bad bad bad")
 #        print("placing road, direction ", direction, " coord: ", self.roadcurrentcoord)
 
 
-        newcoord = self.roadcurrentcoord + self.roaddir
+        newcoord = (self.roadcurrentcoord[0] + self.roaddir[0], self.roadcurrentcoord[1] + self.roaddir[1])
         if newcoord[0] >= self.width or newcoord[0] < 0:
             return None
         if newcoord[1] >= self.height or newcoord[1] < 0:
             return None
 
-        self.roadcurrentcoord += self.roaddir
-
-        road = Road(self.next_id(), tuple(self.roadcurrentcoord), self)
-        self.grid.place_agent(road, tuple(self.roadcurrentcoord))
+        self.roadcurrentcoord = newcoord
 
-        return road
+        return self.placeroad(newcoord)
 
 
     def singleroad(self, initialcoord=(0,0)):
@@ -206,14 +344,12 @@ class HoominWorld(Model):
         roaddir = self.random.randrange(4)
         roadseedx = self.random.randrange(self.width)
         roadseedy = self.random.randrange(self.height)
-        road = Road(self.next_id(), (roadseedx, roadseedy), self)
         self.roadcurrentcoord = (roadseedx, roadseedy)
-        self.grid.place_agent(road, (roadseedx, roadseedy))
+        self.placeroad((roadseedx, roadseedy))
 
-        #note: roads are not scheduled because they do nothing
+        #note: roads are terrain tiles, not agents
         road = None
         counter = 0
-        roadlist = []
         for i in range(self.initial_roads):
             while road is None:
                 val = self.random.random()
@@ -228,18 +364,25 @@ class HoominWorld(Model):
                     #print("err: road is none")
                     True
 
-                roadlist.append(road);
+            self.roadset.append(road)
             road = None
             counter += 1
         #print("initialized ", counter, " road tiles")
-        self.roadset = self.roadset.union(set(roadlist))
-        del roadlist
 
 
     def get_hoomin_level(self):
         return self.hoomin_level
 
     def logstep(self):
+        zeronodes = self.schedule._agents[self.hoomin_zero_id].knownnodes
+        finalnodes = self.schedule._agents[self.final_hoomin_id].knownnodes
+
+        if self.trace is not None:
+            self.trace.append(self.hoomin_level, self.global_scattermessages, zeronodes, finalnodes, self.completedat is not None)
+
+        if not self.textlogs:
+            return
+
         if not self.logger.isopen(HoominWorld.FRIENDNODELOGNAME):
             self.logger.open(HoominWorld.FRIENDNODELOGNAME, overwrite=True)
         if not self.logger.isopen(HoominWorld.TOTALMESSAGELOGNAME):
@@ -247,15 +390,42 @@ class HoominWorld(Model):
 
         self.logger.write(HoominWorld.TOTALMESSAGELOGNAME,str(self.hoomin_level)  + " " + str(self.global_scattermessages))
 
-        st ="STEP: " + str(self.hoomin_level) + " hoominzero: " + str(self.schedule._agents[self.hoomin_zero_id].friendgraph.number_of_nodes()) + " finalhoomin: " + str(self.schedule._agents[self.final_hoomin_id].friendgraph.number_of_nodes())
+        st ="STEP: " + str(self.hoomin_level) + " hoominzero: " + str(zeronodes) + " finalhoomin: " + str(finalnodes)
         self.logger.write(HoominWorld.FRIENDNODELOGNAME, st)
 
+    #step() saves once the run stops and run_model saves again on its way
+    #out, only the first of those writes anything
+    def savetrace(self):
+        if self.savedlevel == self.hoomin_level:
+            return
+        self.savedlevel = self.hoomin_level
+        if self.trace is not None:
+            self.trace.save(self.logger.path(TRACEFILENAME))
+            if len(self.metrics.names) > 0:
+                self.metrics.save(self.logger.path(METRICSFILENAME))
+        if self.contacts is not None:
+            self.contacts.save(self.logger.path(CONTACTFILENAME))
+        if self.timer is not None:
+            self.timer.save(self.logger.path(PROFILEFILENAME))
+
 
     def step(self):
+        timer = self.timer
+        if timer is not None:
+            start = t = timer.now()
+        self.protocol.on_step(self.hoomin_level)
+        if timer is not None:
+            timer.stop("protocol", t)
+        #movement, neighbors and exchanges are timed by the schedule
         self.schedule.step()
-        self.datacollector.collect(self)
+        if self.datacollector is not None:
+            if timer is not None:
+                t = timer.now()
+            self.datacollector.collect(self)
+            if timer is not None:
+                timer.stop("datacollector", t)
         self.hoomin_level += 1
-        if self.hoomin_level % settings.graphrefreshfreq == 0 and settings.displayfriendgraph and not settings.runheadless:
+        if self.hoomin_level % self.config.graphrefreshfreq == 0 and self.config.displayfriendgraph and not self.config.runheadless:
             plt.cla()
             plt.clf()
             nx.draw(self.schedule._agents[self.hoomin_zero_id].friendgraph)
@@ -265,19 +435,143 @@ class HoominWorld(Model):
             print([self.schedule.time,
                    "nothing yet"])
 
-        if len(self.schedule._agents[self.final_hoomin_id].scatterbuffer) >= settings.initial_scattermessages:
+        if timer is not None:
+            t = timer.now()
+        if self.completedat is not None:
+            pass
+        elif len(self.schedule._agents[self.final_hoomin_id].scatterbuffer) >= self.config.initial_scattermessages:
             print("model completed")
+            self.completedat = self.hoomin_level
+            if not self.recordpast:
+                self.running = False
+            if self.textlogs:
+                if not self.logger.isopen(HoominWorld.STEPSTOCOMPLETIONLOGNAME):
+                    self.logger.open(HoominWorld.STEPSTOCOMPLETIONLOGNAME, overwrite=True)
+                self.logger.write(HoominWorld.STEPSTOCOMPLETIONLOGNAME, self.hoomin_level)
+                self.logger.close(HoominWorld.STEPSTOCOMPLETIONLOGNAME)
+                self.logger.flushall()
+        elif self.replay is not None and self.replay.exhausted(self.hoomin_level):
+            print("contact trace ran out at step ", self.hoomin_level)
+            self.censor("trace")
+        elif self.config.stallsteps > 0 and self.stalled():
+            print("no progress in ", self.config.stallsteps, " steps, stopping at ", self.hoomin_level)
+            self.censor("stalled")
+        if timer is not None:
+            t = timer.stop("completion", t)
+
+        #the last step is always sampled so the final state is on record
+        self.metrics.sample(self, self.hoomin_level, force=not self.running)
+        if timer is not None:
+            t = timer.stop("metrics", t)
+
+        if self.metrics.due(self.hoomin_level) or not self.running or self.completedat == self.hoomin_level:
+            self.logstep()
+        if timer is not None:
+            timer.stop("logging", t)
+            timer.stop("step", start)
+        if not self.running:
+            self.savetrace()
+
+    #homes were pickled holding unique_ids instead of hoomins, now that
+    #everybody's loaded they can be linked back up
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        agents = self.schedule._agents
+        for home in self.homelist:
+            home.occupants = set(agents[x] for x in home.occupants)
+
+    def checkpoint(self, path=None):
+        '''
+        saves the whole model to path, the run's checkpoint file by default
+        '''
+        if path is None:
+            path = self.logger.path(CHECKPOINTFILENAME)
+        save_checkpoint(self, path)
+        return path
+
+    @staticmethod
+    def resume(path):
+        '''
+        loads a model saved by checkpoint(), ready to keep stepping
+        '''
+        return load_checkpoint(path)
+
+    #true once none of the logged metrics has moved in stallsteps steps
+    def stalled(self):
+        progress = (self.global_scattermessages,
+                    self.schedule._agents[self.hoomin_zero_id].knownnodes,
+                    self.schedule._agents[self.final_hoomin_id].knownnodes)
+        if progress != self.progress:
+            self.progress = progress
+            self.lastprogress = self.hoomin_level
+            return False
+        return self.hoomin_level - self.lastprogress >= self.config.stallsteps
+
+    #out of budget. a recording run that already completed just stops
+    def stop(self, reason):
+        if self.completedat is not None:
             self.running = False
+        else:
+            self.censor(reason)
+
+    def steps(self):
+        '''
+        steps to completion, or the steps run so far if the model hasn't
+        completed
+        '''
+        if self.completedat is not None:
+            return self.completedat
+        return self.hoomin_level
+
+    def censor(self, reason):
+        '''
+        stops a run that didn't complete, recording the step it got to and
+        why it stopped as "<steps> censored <reason>" in the completion log,
+        and in censored.npy next to the trace
+        '''
+        self.running = False
+        self.censored = reason
+        if self.trace is not None:
+            save_censored(self.logger.path(CENSOREDFILENAME), self.hoomin_level, reason)
+        if self.textlogs:
             if not self.logger.isopen(HoominWorld.STEPSTOCOMPLETIONLOGNAME):
                 self.logger.open(HoominWorld.STEPSTOCOMPLETIONLOGNAME, overwrite=True)
-            self.logger.write(HoominWorld.STEPSTOCOMPLETIONLOGNAME, self.hoomin_level)
+            self.logger.write(HoominWorld.STEPSTOCOMPLETIONLOGNAME, str(self.hoomin_level) + " censored " + reason)
             self.logger.close(HoominWorld.STEPSTOCOMPLETIONLOGNAME)
+            self.logger.flushall()
+
+    def run_model(self, step_count=None, max_seconds=None):
+        '''
+        steps until the model completes, step_count steps have run or
+        max_seconds have gone by. both default to the config's maxsteps and
+        maxseconds, 0 means no limit
+        '''
+        if step_count is None:
+            step_count = self.config.maxsteps
+        if max_seconds is None:
+            max_seconds = self.config.maxseconds
+        deadline = time.monotonic() + max_seconds if max_seconds > 0 else None
 
-        self.logstep()
-
-    def run_model(self, step_count=200):
         if self.verbose:
             print("Initializing hoomins" ,
                   self.schedule.get_hoomin_count(Hoomin))
-        while self.running:
-            self.step()
+        try:
+            while self.running:
+                if step_count > 0 and self.hoomin_level >= step_count:
+                    self.stop("steps")
+                    break
+                if deadline is not None and time.monotonic() >= deadline:
+                    self.stop("time")
+                    break
+                self.step()
+                if self.running and self.config.checkpointinterval > 0 and self.hoomin_level % self.config.checkpointinterval == 0:
+                    self.checkpoint()
+        finally:
+            self.logger.flushall()
+            self.savetrace()
+
+        #finished runs don't need their checkpoint any more
+        if self.config.checkpointinterval > 0:
+            p = self.logger.path(CHECKPOINTFILENAME)
+            if os.path.exists(p):
+                os.remove(p)
@@ -0,0 +1,58 @@
+'''
+Per-phase timing for the simulation loop.
+
+With profile turned on the model keeps a PhaseTimer and the step code adds
+the time spent in each phase (movement, neighbor discovery, exchanges, the
+completion check, data collection, metrics, logging) to it. With profile off
+model.timer is None and the step code only pays for the None checks.
+'''
+
+import time
+
+
+PROFILEFILENAME = "profile"
+
+#order phases are listed in the summary, anything else goes after
+PHASES = ("step", "protocol", "movement", "neighbors", "exchange", "replay",
+          "datacollector", "completion", "metrics", "logging")
+
+
+class PhaseTimer:
+
+    def __init__(self):
+        self.totals = {}
+        self.counts = {}
+
+    @staticmethod
+    def now():
+        return time.perf_counter()
+
+    def add(self, phase, seconds, calls=1):
+        self.totals[phase] = self.totals.get(phase, 0.0) + seconds
+        self.counts[phase] = self.counts.get(phase, 0) + calls
+
+    #adds the time since start, as returned by now(), to phase
+    def stop(self, phase, start):
+        end = time.perf_counter()
+        self.add(phase, end - start)
+        return end
+
+    def summary(self):
+        '''
+        one line per phase: name, calls, total seconds, mean microseconds per
+        call and share of the total step time
+        '''
+        phases = [p for p in PHASES if p in self.totals] + sorted(p for p in self.totals if p not in PHASES)
+        steptime = self.totals.get("step", 0.0)
+        lines = ["phase calls seconds meanus percent"]
+        for p in phases:
+            total = self.totals[p]
+            calls = self.counts[p]
+            mean = 1e6 * total / calls if calls else 0.0
+            share = 100.0 * total / steptime if steptime else 0.0
+            lines.append("%s %d %.6f %.3f %.2f" % (p, calls, total, mean, share))
+        return "\n".join(lines) + "\n"
+
+    def save(self, path):
+        with open(path, 'w') as f:
+            f.write(self.summary())
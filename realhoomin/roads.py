@@ -0,0 +1,240 @@
+'''
+Static lookup tables for the road network.
+
+Roads don't move once HoominWorld.__init__ is done, so anything hoomins
+would otherwise search the grid for on every step gets worked out once
+here.
+'''
+
+from collections import OrderedDict
+
+import numpy as np
+
+from realhoomin.terrain import ROAD
+
+
+#the 8 cells around a cell, in the order the nearest-road search tries them
+KINGMOVES = ((1, 0), (0, 1), (-1, 0), (0, -1), (1, 1), (-1, 1), (-1, -1), (1, -1))
+
+#hoomins follow roads up/down/left/right, same as random_pathfind
+ROADMOVES = ((1, 0), (0, 1), (-1, 0), (0, -1))
+
+#cells a hoomin can step to from where it stands, in the order mesa's
+#von Neumann neighborhood (with center) lists them
+CELLMOVES = ((0, -1), (-1, 0), (0, 0), (1, 0), (0, 1))
+
+
+def csr_gather(indptr, indices, rows):
+    '''
+    concatenated neighbor lists for rows of a CSR table, along with which
+    entry of rows each neighbor came from
+    '''
+    starts = indptr[rows]
+    lengths = indptr[rows + 1] - starts
+    total = int(lengths.sum())
+    owner = np.repeat(np.arange(len(rows)), lengths)
+    offsets = np.arange(total) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    return indices[starts[owner] + offsets], owner
+
+
+class RoadMap:
+
+    def __init__(self, width, height, roadcells, torus=True):
+        self.width = width
+        self.height = height
+        self.torus = torus
+
+        self.mask = np.zeros((width, height), dtype=bool)
+        for x, y in roadcells:
+            self.mask[x, y] = True
+
+        self.nearest = self._nearest_roads()
+
+        #road graph: every road tile gets an index, roadindex maps cells to
+        #it (-1 off road) and roadcells maps it back. roadadj_indptr and
+        #roadadj_indices hold each tile's neighboring tiles, CSR style
+        xs, ys = np.nonzero(self.mask)
+        self.roadcells = np.stack((xs, ys), axis=1)
+        self.roadindex = np.full((width, height), -1, dtype=np.int64)
+        self.roadindex[xs, ys] = np.arange(len(xs))
+        self.roadadj_indptr, self.roadadj_indices = self._road_adjacency()
+
+        #for every cell, the road tiles a hoomin standing there can step
+        #onto, including the one it's on. CSR style over cells numbered
+        #x * height + y
+        self.cellroads_indptr, self.cellroads_indices = self._cell_roads()
+
+    @staticmethod
+    def from_terrain(terrain):
+        return RoadMap(terrain.width, terrain.height, terrain.cells(ROAD).tolist(), terrain.torus)
+
+    def _shift(self, cells, dx, dy):
+        '''
+        moves an (n, 2) array of cells by (dx, dy). returns the new cells and
+        which of them are still on the map
+        '''
+        moved = cells + np.array((dx, dy))
+        if self.torus:
+            moved[:, 0] %= self.width
+            moved[:, 1] %= self.height
+            return moved, np.ones(len(cells), dtype=bool)
+        valid = (moved[:, 0] >= 0) & (moved[:, 0] < self.width) & (moved[:, 1] >= 0) & (moved[:, 1] < self.height)
+        return np.clip(moved, 0, (self.width - 1, self.height - 1)), valid
+
+    def _road_adjacency(self):
+        n = len(self.roadcells)
+        nbrs = np.full((n, len(ROADMOVES)), -1, dtype=np.int64)
+        for i, (dx, dy) in enumerate(ROADMOVES):
+            moved, valid = self._shift(self.roadcells, dx, dy)
+            idx = self.roadindex[moved[:, 0], moved[:, 1]]
+            nbrs[:, i] = np.where(valid, idx, -1)
+
+        keep = nbrs >= 0
+        indptr = np.zeros(n + 1, dtype=np.int64)
+        indptr[1:] = np.cumsum(keep.sum(axis=1))
+        return indptr, nbrs[keep]
+
+    def _cell_roads(self):
+        xs, ys = np.meshgrid(np.arange(self.width), np.arange(self.height), indexing="ij")
+        cells = np.stack((xs.ravel(), ys.ravel()), axis=1)
+        nbrs = np.full((len(cells), len(CELLMOVES)), -1, dtype=np.int64)
+        for i, (dx, dy) in enumerate(CELLMOVES):
+            moved, valid = self._shift(cells, dx, dy)
+            idx = self.roadindex[moved[:, 0], moved[:, 1]]
+            nbrs[:, i] = np.where(valid, idx, -1)
+
+        keep = nbrs >= 0
+        indptr = np.zeros(len(cells) + 1, dtype=np.int64)
+        indptr[1:] = np.cumsum(keep.sum(axis=1))
+        return indptr, nbrs[keep]
+
+    def cellindex(self, pos):
+        return pos[0] * self.height + pos[1]
+
+    def random_road_near(self, pos, rng):
+        '''
+        a random road tile a hoomin at pos can step onto (up/down/left/right
+        or staying put), or None if there isn't one
+        '''
+        cell = pos[0] * self.height + pos[1]
+        start = self.cellroads_indptr[cell]
+        count = self.cellroads_indptr[cell + 1] - start
+        if count == 0:
+            return None
+        x, y = self.roadcells[self.cellroads_indices[start + rng.randrange(count)]]
+        return (int(x), int(y))
+
+    def isroad(self, pos):
+        return bool(self.mask[pos[0], pos[1]])
+
+    def _nearest_roads(self):
+        '''
+        multi-source breadth first search out from every road tile. hoomins
+        walk to roads diagonally and without wrapping around the edges of
+        the map, so distance is counted in king moves inside the grid.
+        cells with no road anywhere get (-1, -1)
+        '''
+        nearest = np.full((self.width, self.height, 2), -1, dtype=np.int64)
+        xs, ys = np.nonzero(self.mask)
+        nearest[xs, ys, 0] = xs
+        nearest[xs, ys, 1] = ys
+
+        found = self.mask.copy()
+        frontier = self.mask.copy()
+        while frontier.any():
+            reached = np.zeros_like(found)
+            for dx, dy in KINGMOVES:
+                #cells that can step (dx, dy) onto a frontier cell
+                src = (slice(max(0, -dx), self.width - max(0, dx)), slice(max(0, -dy), self.height - max(0, dy)))
+                dst = (slice(max(0, dx), self.width - max(0, -dx)), slice(max(0, dy), self.height - max(0, -dy)))
+                take = frontier[dst] & ~found[src] & ~reached[src]
+                nearest[src][take] = nearest[dst][take]
+                reached[src] |= take
+            found |= reached
+            frontier = reached
+
+        return nearest
+
+    def nearest_road(self, pos):
+        x, y = self.nearest[pos[0], pos[1]]
+        if x < 0:
+            return None
+        return (int(x), int(y))
+
+
+class RoadRouter:
+    '''
+    Shortest paths along the road graph.
+
+    Each destination gets a breadth first search tree over the road tiles,
+    boiled down to a next-hop table, and the most recently used trees are
+    kept around so hoomins heading to the same place share one search.
+    '''
+
+    def __init__(self, roadmap, cachesize=256):
+        self.roadmap = roadmap
+        self.cachesize = cachesize
+        self.trees = OrderedDict()
+
+    def nexthops(self, target):
+        '''
+        next-hop table toward road tile target: for every road tile, the
+        index of the neighboring tile one step closer, itself at the
+        target, or -1 if the target can't be reached from there
+        '''
+        tree = self.trees.get(target)
+        if tree is not None:
+            self.trees.move_to_end(target)
+            return tree
+
+        rm = self.roadmap
+        indptr, indices = rm.roadadj_indptr, rm.roadadj_indices
+        n = len(rm.roadcells)
+
+        dist = np.full(n, -1, dtype=np.int64)
+        nexthop = np.full(n, -1, dtype=np.int64)
+        dist[target] = 0
+        nexthop[target] = target
+        frontier = np.array([target], dtype=np.int64)
+        d = 0
+        while len(frontier) > 0:
+            #roads are two way, so the tiles next to the frontier are one
+            #step further out and their next hop is the frontier tile
+            nbrs, owner = csr_gather(indptr, indices, frontier)
+            fresh = dist[nbrs] < 0
+            nbrs, owner = nbrs[fresh], owner[fresh]
+            nbrs, first = np.unique(nbrs, return_index=True)
+            d += 1
+            dist[nbrs] = d
+            nexthop[nbrs] = frontier[owner[first]]
+            frontier = nbrs
+
+        self.trees[target] = nexthop
+        if len(self.trees) > self.cachesize:
+            self.trees.popitem(last=False)
+        return nexthop
+
+    def next_hop(self, pos, dst):
+        '''
+        the road cell to move to from pos to get closer to dst. dst doesn't
+        have to be on a road, the road nearest to it is used. None if pos
+        isn't on a road or there's no way there
+        '''
+        rm = self.roadmap
+        here = rm.roadindex[pos[0], pos[1]]
+        if here < 0:
+            return None
+
+        dx, dy = int(dst[0]), int(dst[1])
+        target = rm.roadindex[dx, dy]
+        if target < 0:
+            road = rm.nearest_road((dx, dy))
+            if road is None:
+                return None
+            target = rm.roadindex[road[0], road[1]]
+
+        hop = self.nexthops(int(target))[here]
+        if hop < 0:
+            return None
+        x, y = rm.roadcells[hop]
+        return (int(x), int(y))
@@ -1,6 +1,7 @@
 from collections import defaultdict
 
 from mesa.time import RandomActivation
+from realhoomin import contacts, kernel
 
 
 
@@ -23,7 +24,16 @@ class RandomHoominActivation(RandomActivation):
         del self.hoomintypes[agent_class][agent.unique_id]
 
     def step(self, byhoomintype=True):
-        if byhoomintype:
+        if self.model.replay is not None:
+            #nobody moves, the recorded contacts stand in for everything
+            timer = self.model.timer
+            if timer is not None:
+                t = timer.now()
+            self.model.replay.exchange(self.model, self.model.hoomin_level)
+            if timer is not None:
+                timer.stop("replay", t)
+            self.steps += 1
+        elif byhoomintype:
             for agent_class in self.hoomintypes:
                 self.step_hoomintype(agent_class)
             self.steps += 1
@@ -39,12 +49,71 @@ class RandomHoominActivation(RandomActivation):
     def step_hoomintype(self, hoomintype):
         agent_keys = list(self.hoomintypes[hoomintype].keys())
         self.model.random.shuffle(agent_keys)
+
+        timer = self.model.timer
+
+        if self.model.config.engine == "vectorized":
+            hoomins = [self.hoomintypes[hoomintype][key] for key in agent_keys]
+            if timer is not None:
+                t = timer.now()
+            kernel.move_hoomins(self.model, hoomins)
+            if timer is not None:
+                timer.stop("movement", t)
+            self.exchange_snapshot(hoomins)
+            return
+
+        if self.model.batchcontacts and self.model.snapshotcontacts:
+            self.step_snapshot([self.hoomintypes[hoomintype][key] for key in agent_keys])
+            return
+
         for key in agent_keys:
             hoomin = self.hoomintypes[hoomintype][key]
+            if timer is not None:
+                t = timer.now()
             hoomin.step()
-            neighborhoomins = hoomin.get_neighbor_hoomins(hoomin.scatterrange)
+            if timer is not None:
+                t = timer.stop("movement", t)
+            if self.model.batchcontacts:
+                neighborhoomins = contacts.contacts_for(self.model.grid, hoomin, hoomin.scatterrange)
+            else:
+                neighborhoomins = hoomin.get_neighbor_hoomins(hoomin.scatterrange)
+            if timer is not None:
+                t = timer.stop("neighbors", t)
             for n in neighborhoomins:
                 hoomin.send_blockdata(n)
+            if timer is not None:
+                timer.add("exchange", timer.now() - t, len(neighborhoomins))
+            if self.model.contacts is not None and len(neighborhoomins) > 0:
+                self.model.contacts.extend(self.model.hoomin_level, hoomin.unique_id,
+                                           [n.unique_id for n in neighborhoomins])
+
+    #everybody moves first, then all exchanges happen from where the
+    #hoomins ended up. senders still go in activation order
+    def step_snapshot(self, hoomins):
+        timer = self.model.timer
+        if timer is not None:
+            t = timer.now()
+        for hoomin in hoomins:
+            hoomin.step()
+        if timer is not None:
+            timer.add("movement", timer.now() - t, len(hoomins))
+        self.exchange_snapshot(hoomins)
+
+    def exchange_snapshot(self, hoomins):
+        timer = self.model.timer
+        if timer is not None:
+            t = timer.now()
+        grid = self.model.grid
+        senders, receivers = contacts.contact_pairs(grid, hoomins, [h.scatterrange for h in hoomins])
+        if timer is not None:
+            t = timer.stop("neighbors", t)
+        for s, r in zip(senders, receivers):
+            hoomins[s].send_blockdata(grid.slothoomins[r])
+        if timer is not None:
+            timer.add("exchange", timer.now() - t, len(senders))
+        if self.model.contacts is not None:
+            self.model.contacts.extend(self.model.hoomin_level, [hoomins[s].unique_id for s in senders],
+                                       [grid.slothoomins[r].unique_id for r in receivers])
 
     def get_hoomin_count(self, hoomintype):
         return len(self.hoomintypes[hoomintype].values())
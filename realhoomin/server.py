@@ -2,8 +2,11 @@ from mesa.visualization.ModularVisualization import ModularServer
 from mesa.visualization.modules import CanvasGrid, ChartModule, NetworkModule
 from mesa.visualization.UserParam import UserSettableParameter
 
-from realhoomin.agents import Hoomin, Road, MeetHoomin, FindRoadHoomin, Home, SocialHoomin
+import numpy as np
+
+from realhoomin.agents import Hoomin, MeetHoomin, FindRoadHoomin, SocialHoomin
 from realhoomin.model import HoominWorld
+from realhoomin.terrain import ROAD, HOME
 import settings
 
 
@@ -58,29 +61,47 @@ def hoomin_portrayal(agent):
         portrayal["scale"] = 0.9
         portrayal["Layer"] = 1
 
-    elif type(agent) is Road:
-        portrayal["Shape"] = "realhoomin/resources/road.png"
-        portrayal["scale"] = 1.0
-        portrayal["Layer"] = 0
-
     elif type(agent) is MeetHoomin:
         portrayal["Shape"] = "realhoomin/resources/base_hoomin.png"
         portrayal["scale"] = 0.9
         portrayal["Layer"] = 1
 
-    elif type(agent) is FindRoadHoomin or type(agent) is SocialHoomin:
+    elif isinstance(agent, (FindRoadHoomin, SocialHoomin)):
         portrayal["Shape"] = "realhoomin/resources/base_hoomin.png"
         portrayal["scale"] = 0.9
         portrayal["Layer"] = 1
 
-    elif type(agent) is Home:
-        portrayal["Shape"] = "realhoomin/resources/home.png"
-        portrayal["scale"] = 1.5
-        portrayal["Layer"] = 0
-
     return portrayal
 
-canvas_element = CanvasGrid(hoomin_portrayal, settings.width, settings.height, 500, 500)
+#roads and homes aren't in the grid, they're drawn from the terrain
+def tile_portrayal(tile):
+    if tile & HOME:
+        return {"Shape" : "realhoomin/resources/home.png", "scale" : 1.5, "Layer" : 0}
+    elif tile & ROAD:
+        return {"Shape" : "realhoomin/resources/road.png", "scale" : 1.0, "Layer" : 0}
+
+
+class TerrainCanvasGrid(CanvasGrid):
+    '''
+    CanvasGrid that draws the terrain tiles under whatever is in the grid
+    '''
+
+    def __init__(self, portrayal_method, tile_method, *args, **kwargs):
+        super().__init__(portrayal_method, *args, **kwargs)
+        self.tile_method = tile_method
+
+    def render(self, model):
+        grid_state = super().render(model)
+        tiles = model.terrain.tiles
+        for x, y in zip(*np.nonzero(tiles)):
+            portrayal = self.tile_method(int(tiles[x, y]))
+            if portrayal:
+                portrayal["x"] = int(x)
+                portrayal["y"] = int(y)
+                grid_state[portrayal["Layer"]].append(portrayal)
+        return grid_state
+
+canvas_element = TerrainCanvasGrid(hoomin_portrayal, tile_portrayal, settings.width, settings.height, 500, 500)
 chart_element = ChartModule([{"Label" : "Messages Exchanged", "Color" : "#CACACA"}, {"Label" : "FriendGraph Node Count", "Color" : "#FF0000"}])
 
 friendgraph = NetworkModule(friendgraph_portrayal, 50, 50, library='d3')
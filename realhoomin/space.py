@@ -0,0 +1,145 @@
+from mesa.space import MultiGrid
+import numpy as np
+
+from realhoomin.agents import Hoomin
+
+
+class HoominGrid(MultiGrid):
+    '''
+    MultiGrid that also keeps a bucketed index of where the hoomins are.
+
+    Walking every cell of a radio neighborhood mostly looks at empty cells.
+    The index splits the map into square buckets of bucketsize cells and
+    only tracks hoomins, so a range query looks at a handful of buckets and
+    the hoomins in them instead of every cell within radio range.
+    '''
+
+    def __init__(self, width, height, torus, bucketsize=8):
+        super().__init__(width, height, torus)
+        self.bucketsize = max(1, int(bucketsize))
+
+        #bucket -> {hoomin : None}, dicts keep insertion order so queries
+        #come back in a stable order
+        self.buckets = {}
+        self.hoominbucket = {}
+
+        #per radius, per coordinate: buckets touched along one axis
+        self._xreach = {}
+        self._yreach = {}
+
+        #hoomin positions mirrored into arrays for the batched contact
+        #phase. slots are handed out the first time a hoomin is placed and
+        #never reused
+        self.hoominslots = {}
+        self.slothoomins = []
+        self.positions = np.zeros((16, 2), dtype=np.int64)
+        self.present = np.zeros(16, dtype=bool)
+
+        #mesa keeps the empty cells in a list it scans on every place and
+        #remove, and with roads and homes off the grid that's nearly every
+        #cell. a set does the same bookkeeping in constant time
+        self.empties = set(self.empties)
+
+    def is_cell_empty(self, pos):
+        x, y = pos
+        return len(self.grid[x][y]) == 0
+
+    #nothing here picks random empty cells, these just keep mesa's versions
+    #working on a set
+    def move_to_empty(self, agent):
+        if len(self.empties) == 0:
+            raise Exception("ERROR: No empty cells")
+        pos = agent.pos
+        new_pos = agent.random.choice(sorted(self.empties))
+        self._place_agent(new_pos, agent)
+        agent.pos = new_pos
+        self._remove_agent(pos, agent)
+
+    def find_empty(self):
+        import random
+
+        if len(self.empties) == 0:
+            return None
+        return random.choice(sorted(self.empties))
+
+    def _place_agent(self, pos, agent):
+        x, y = pos
+        self.grid[x][y].add(agent)
+        self.empties.discard(pos)
+        if isinstance(agent, Hoomin):
+            b = (pos[0] // self.bucketsize, pos[1] // self.bucketsize)
+            if b not in self.buckets:
+                self.buckets[b] = {}
+            self.buckets[b][agent] = None
+            self.hoominbucket[agent] = b
+
+            slot = self.hoominslots.get(agent)
+            if slot is None:
+                slot = len(self.slothoomins)
+                if slot == len(self.present):
+                    self.positions = np.concatenate((self.positions, np.zeros_like(self.positions)))
+                    self.present = np.concatenate((self.present, np.zeros_like(self.present)))
+                self.hoominslots[agent] = slot
+                self.slothoomins.append(agent)
+            self.positions[slot] = pos
+            self.present[slot] = True
+
+    def _remove_agent(self, pos, agent):
+        x, y = pos
+        cell = self.grid[x][y]
+        cell.remove(agent)
+        if len(cell) == 0:
+            self.empties.add(pos)
+        if agent in self.hoominbucket:
+            b = self.hoominbucket.pop(agent)
+            del self.buckets[b][agent]
+            self.present[self.hoominslots[agent]] = False
+
+    def _axis_reach(self, cache, coord, radius, size):
+        reach = cache.get(radius)
+        if reach is None:
+            reach = []
+            for c in range(size):
+                if self.torus:
+                    cells = set((c + d) % size for d in range(-radius, radius + 1))
+                else:
+                    cells = set(range(max(0, c - radius), min(size, c + radius + 1)))
+                reach.append(tuple(sorted(set(x // self.bucketsize for x in cells))))
+            cache[radius] = reach
+        return reach[coord]
+
+    def _axis_distance(self, a, b, size):
+        d = abs(a - b)
+        if self.torus:
+            return min(d, size - d)
+        return d
+
+    def get_hoomins_in_range(self, pos, radius):
+        '''
+        Returns every hoomin within manhattan distance radius of pos (the von
+        Neumann neighborhood), without the center cell. This is the same set
+        of hoomins you get from walking iter_neighborhood(pos, False, False,
+        radius) and picking out the Hoomin instances.
+        '''
+        x, y = pos
+        #on a small torus the neighborhood wraps back around onto the
+        #center cell, and mesa counts it then
+        keepcenter = self.torus and (radius >= self.width or radius >= self.height)
+
+        result = []
+        for bx in self._axis_reach(self._xreach, x, radius, self.width):
+            for by in self._axis_reach(self._yreach, y, radius, self.height):
+                bucket = self.buckets.get((bx, by))
+                if not bucket:
+                    continue
+                for hoomin in bucket:
+                    hx, hy = hoomin.pos
+                    if hx == x and hy == y:
+                        if keepcenter:
+                            result.append(hoomin)
+                        continue
+                    if self._axis_distance(hx, x, self.width) + self._axis_distance(hy, y, self.height) > radius:
+                        continue
+                    result.append(hoomin)
+
+        return result
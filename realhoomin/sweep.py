@@ -0,0 +1,243 @@
+'''
+Parameter sweeps.
+
+A Sweep runs a base HoominConfig at a set of points in parameter space,
+trials times each, over the batch runner's process pool. Points come from
+a design: every combination of listed values (grid_design), a Latin
+hypercube over ranges (lhs_design), or more points around the parts of
+the space where results so far vary the most between trials
+(refine_design).
+
+Every finished trial is appended to one results table, logs/<name>.csv,
+as soon as it comes back, and running a sweep again skips every (point,
+trial) already in the table or already finished in its log directory, so
+an interrupted sweep picks up where it stopped. Refined points depend on
+the table, so they're saved next to it (logs/<name>.points.json) before
+they run and picked back up until every trial of them is in. Trial t uses the same seed
+at every point, so points are compared on the same cities.
+'''
+
+import csv
+import hashlib
+import itertools
+import json
+import os
+
+import numpy as np
+
+from realhoomin.batch import TrialParams, run_batch, trial_seed
+from realhoomin.catalog import read_result
+
+
+COLUMNS = ["point", "trial", "seed", "steps", "censored"]
+
+
+def grid_design(space):
+    '''
+    every combination of {name : [values]}
+    '''
+    names = sorted(space)
+    return [dict(zip(names, values)) for values in itertools.product(*(space[n] for n in names))]
+
+
+#the value a fraction u of the way through [low, high]. int bounds give
+#every int in the range an equal share
+def _draw(low, high, u):
+    if isinstance(low, int) and isinstance(high, int):
+        return min(high, low + int(u * (high - low + 1)))
+    return float(low + u * (high - low))
+
+
+def lhs_design(space, n, rng):
+    '''
+    n points over {name : (low, high)}, one in each of n equal slices of
+    every range. a range with int bounds gives ints
+    '''
+    names = sorted(space)
+    cols = {}
+    for name in names:
+        u = (rng.permutation(n) + rng.random(n)) / n
+        cols[name] = [_draw(space[name][0], space[name][1], x) for x in u]
+    return [{name: cols[name][i] for name in names} for i in range(n)]
+
+
+def refine_design(results, space, n, rng, top=4, shrink=0.25):
+    '''
+    n new points around the top points of results with the largest spread
+    in steps between trials, each drawn from a box shrink times the size of
+    the full ranges, centered on the point and clipped to the space
+    '''
+    names = sorted(space)
+    bypoint = {}
+    for row in results:
+        if row["censored"] is None:
+            key = tuple(row[name] for name in names)
+            bypoint.setdefault(key, []).append(row["steps"])
+    if len(bypoint) == 0:
+        return lhs_design(space, n, rng)
+
+    spread = sorted(bypoint, key=lambda k: np.std(bypoint[k]), reverse=True)[:top]
+    points = []
+    for i in range(n):
+        center = spread[i % len(spread)]
+        point = {}
+        for name, c in zip(names, center):
+            low, high = space[name]
+            half = shrink * (high - low) / 2
+            lo = max(low, c - half)
+            hi = min(high, c + half)
+            if isinstance(low, int) and isinstance(high, int):
+                lo, hi = int(np.floor(lo)), int(np.ceil(hi))
+            point[name] = _draw(lo, hi, rng.random())
+        points.append(point)
+    return points
+
+
+#a results table cell back as what was swept: int, float, bool or string
+def _value(text):
+    for kind in (int, float):
+        try:
+            return kind(text)
+        except ValueError:
+            pass
+    if text in ("True", "False"):
+        return text == "True"
+    return text
+
+
+def point_id(point):
+    key = ",".join(name + "=" + repr(point[name]) for name in sorted(point))
+    return hashlib.sha1(key.encode()).hexdigest()[:10]
+
+
+class Sweep:
+
+    def __init__(self, name, config, trials, baseseed=0, logdir="logs"):
+        self.name = name
+        self.config = config
+        self.trials = trials
+        self.baseseed = baseseed
+        self.logdir = logdir
+        self.path = os.path.join(logdir, name + ".csv")
+        self.pointspath = os.path.join(logdir, name + ".points.json")
+
+    #run directories are <tag><trial>, the trailing dash keeps the point
+    #id from running into the trial number
+    def tag(self, point):
+        return self.name + "-" + point_id(point) + "-"
+
+    def results(self):
+        '''
+        every row of the results table, with trial, seed, steps and numeric
+        parameters as numbers, True/False as bools, anything else as a
+        string, and censored as None for completed runs
+        '''
+        if not os.path.exists(self.path):
+            return []
+        rows = []
+        with open(self.path, newline='') as f:
+            for row in csv.DictReader(f):
+                for k, v in row.items():
+                    if k in ("point", "censored"):
+                        continue
+                    row[k] = _value(v)
+                row["censored"] = row["censored"] or None
+                rows.append(row)
+        return rows
+
+    def _append(self, rows, names):
+        exists = os.path.exists(self.path)
+        if not exists:
+            os.makedirs(self.logdir, exist_ok=True)
+        with open(self.path, 'a', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=COLUMNS + names)
+            if not exists:
+                writer.writeheader()
+            writer.writerows(rows)
+
+    def jobs(self, points):
+        '''
+        the trials for points that aren't in the results table yet. trials
+        that finished without making it into the table (the sweep was killed
+        between the two) are added to it from their log directories
+        '''
+        names = self.names(points)
+        done = set((row["point"], row["trial"]) for row in self.results())
+        recovered = []
+        jobs = []
+        for point in points:
+            pid = point_id(point)
+            tag = self.tag(point)
+            config = self.config.replace(**point)
+            for trial in range(self.trials):
+                if (pid, trial) in done:
+                    continue
+                done.add((pid, trial))
+                seed = trial_seed(self.name, trial, self.baseseed)
+                steps, censored = read_result(os.path.join(self.logdir, tag + str(trial)))
+                if steps is not None:
+                    recovered.append(self.row(point, trial, seed, steps, censored))
+                else:
+                    jobs.append(TrialParams(tag, trial, seed, config, logdir=self.logdir))
+        if len(recovered) > 0:
+            self._append(recovered, names)
+        return jobs
+
+    def row(self, point, trial, seed, steps, censored):
+        row = {"point": point_id(point), "trial": trial, "seed": seed,
+               "steps": steps, "censored": censored or ""}
+        row.update(point)
+        return row
+
+    def finished(self, points):
+        done = set((row["point"], row["trial"]) for row in self.results())
+        return all((point_id(point), trial) in done for point in points for trial in range(self.trials))
+
+    def refine(self, space, n, rng, **kwargs):
+        '''
+        the points to run for a refine step: the last refined points if any
+        of their trials aren't done yet, otherwise n new ones from
+        refine_design, saved before they're returned
+        '''
+        if os.path.exists(self.pointspath):
+            with open(self.pointspath, 'r') as f:
+                points = json.load(f)
+            if not self.finished(points):
+                return points
+
+        points = refine_design(self.results(), space, n, rng, **kwargs)
+        os.makedirs(self.logdir, exist_ok=True)
+        tmp = self.pointspath + ".tmp"
+        with open(tmp, 'w') as f:
+            json.dump(points, f)
+        os.replace(tmp, self.pointspath)
+        return points
+
+    def names(self, points):
+        names = sorted(set(name for point in points for name in point))
+        if os.path.exists(self.path):
+            with open(self.path, newline='') as f:
+                header = next(csv.reader(f), [])
+            if len(header) > 0 and header[len(COLUMNS):] != names:
+                raise ValueError("sweep " + self.name + " was run over " + ", ".join(header[len(COLUMNS):]) +
+                                 ", not " + ", ".join(names))
+        return names
+
+    def run(self, points, workers=None, callback=None):
+        '''
+        runs every trial of points that isn't done yet, appending each one to
+        the results table as it finishes. returns the whole table
+        '''
+        names = self.names(points)
+        jobs = self.jobs(points)
+        bytag = {self.tag(point): point for point in points}
+        seeds = {(job.tag, job.trial): job.seed for job in jobs}
+
+        def record(tag, trial, steps, censored):
+            self._append([self.row(bytag[tag], trial, seeds[(tag, trial)], steps, censored)], names)
+            if callback is not None:
+                callback(bytag[tag], trial, steps, censored)
+
+        if len(jobs) > 0:
+            run_batch(jobs, workers, record)
+        return self.results()
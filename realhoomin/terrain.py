@@ -0,0 +1,44 @@
+'''
+The static layer of the map.
+
+Roads and homes never move, so rather than being agents sitting in the
+MultiGrid next to the hoomins they're flags in one uint8 array, one entry
+per cell. Only hoomins live in the grid, and anything that wants to know
+what a cell is built on looks it up here.
+'''
+
+import numpy as np
+
+
+#tile flags, a cell can be more than one (a grid road laid over a home)
+EMPTY = 0
+ROAD = 1
+HOME = 2
+
+
+class Terrain:
+
+    def __init__(self, width, height, torus=True):
+        self.width = width
+        self.height = height
+        self.torus = torus
+        self.tiles = np.zeros((width, height), dtype=np.uint8)
+
+    def place(self, pos, tile):
+        self.tiles[pos[0], pos[1]] |= tile
+
+    def tile(self, pos):
+        return int(self.tiles[pos[0], pos[1]])
+
+    def isempty(self, pos):
+        return self.tiles[pos[0], pos[1]] == EMPTY
+
+    def isroad(self, pos):
+        return bool(self.tiles[pos[0], pos[1]] & ROAD)
+
+    def cells(self, tile):
+        '''
+        (n, 2) array of the cells with tile set
+        '''
+        xs, ys = np.nonzero(self.tiles & tile)
+        return np.stack((xs, ys), axis=1)
@@ -0,0 +1,65 @@
+'''
+Columnar per-step metrics for a run.
+
+Instead of a couple of text lines per step, each step is one row in a
+numpy structured array that gets saved as a single .npy file per run. The
+analysis side can memory-map these instead of parsing text.
+'''
+
+import numpy as np
+
+
+TRACEFILENAME = "trace.npy"
+CENSOREDFILENAME = "censored.npy"
+
+TRACEDTYPE = np.dtype([("step", np.int64),
+                       ("messages", np.int64),
+                       ("hoominzero", np.int32),
+                       ("finalhoomin", np.int32),
+                       ("completed", np.bool_)])
+
+#one row, the step a run was cut short at and why
+CENSOREDDTYPE = np.dtype([("step", np.int64),
+                          ("reason", "U16")])
+
+
+class StepTrace:
+    '''
+    growable array of per-step rows: step, global scattermessages, friend
+    graph node counts for hoomin zero and the final hoomin, and whether the
+    model had completed by that step
+    '''
+
+    def __init__(self, capacity=256):
+        self.data = np.zeros(max(1, capacity), dtype=TRACEDTYPE)
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def append(self, step, messages, hoominzero, finalhoomin, completed):
+        if self.size == len(self.data):
+            self.data = np.concatenate((self.data, np.zeros(len(self.data), dtype=TRACEDTYPE)))
+        self.data[self.size] = (step, messages, hoominzero, finalhoomin, completed)
+        self.size += 1
+
+    @property
+    def rows(self):
+        return self.data[:self.size]
+
+    def save(self, path):
+        np.save(path, self.rows)
+
+
+def load_trace(path, mmap=True):
+    return np.load(path, mmap_mode="r" if mmap else None)
+
+
+def save_censored(path, step, reason):
+    np.save(path, np.array([(step, reason)], dtype=CENSOREDDTYPE))
+
+
+#(step, reason) for a run that was cut short
+def load_censored(path):
+    row = np.load(path)[0]
+    return int(row["step"]), str(row["reason"])
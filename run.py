@@ -1,36 +1,35 @@
 from realhoomin.server import server
-from realhoomin.model import HoominWorld
+from realhoomin.batch import make_trials, run_batch
+from realhoomin.config import HoominConfig
 import settings
 import sys
 
-height = settings.height
-width = settings.width
+highrange = HoominConfig.from_settings(bluetooth_range=8,
+                                       socialswitchprobability=0.1,
+                                       randomswitchprobability=0.03)
 
-def trial_highrange(start, end):
-    settings.bluetooth_range = 8
-    settings.socialswitchprobability = 0.1
-    settings.randomswitchprobability = 0.03
+lowrange = HoominConfig.from_settings(bluetooth_range=4,
+                                      socialswitchprobability=0.1,
+                                      randomswitchprobability=0.03)
 
-    for x in range(start, end):
-        hworld = HoominWorld(logtag="highrange"+str(x), height=height, width=width)
-        hworld.run_model()
-        del hworld
+def trial_highrange(start, end):
+    return make_trials("highrange", start, end, highrange)
 
 def trial_lowrange(start, end):
-    settings.bluetooth_range = 4
-    settings.socialswitchprobability = 0.1
-    settings.randomswitchprobability = 0.03
+    return make_trials("lowrange", start, end, lowrange)
 
-    for x in range(start, end):
-        hworld = HoominWorld(logtag="lowrange"+str(x), height=height, width=width)
-        hworld.run_model()
-        del hworld
+def report(tag, trial, steps, censored):
+    if censored is None:
+        print(tag, trial, "completed in", steps, "steps")
+    else:
+        print(tag, trial, "stopped at", steps, "steps, censored:", censored)
 
-if settings.runheadless:
-    print("running lowrange model")
-    trial_lowrange(int(sys.argv[1]), int(sys.argv[2]))
-    print("running highrange model")
-    trial_highrange(int(sys.argv[1]), int(sys.argv[2]))
-    print("DONE")
-else:
-    server.launch()
+if __name__ == "__main__":
+    if settings.runheadless:
+        workers = int(sys.argv[3]) if len(sys.argv) > 3 else None
+        trials = trial_lowrange(int(sys.argv[1]), int(sys.argv[2])) + trial_highrange(int(sys.argv[1]), int(sys.argv[2]))
+        print("running lowrange and highrange models")
+        run_batch(trials, workers, report)
+        print("DONE")
+    else:
+        server.launch()
@@ -1,6 +1,3 @@
-import networkx as nx
-
-
 ## tunable settings for model
 
 exampleval = "blob"
@@ -14,6 +11,27 @@ width = 60
 initial_hoomins = 10
 initial_scattermessages = 10
 
+#where hoomin state lives. "objects" keeps it on each hoomin, "arrays"
+#keeps positions, destinations, modes and road flags in numpy columns for
+#the vectorized engine. hoomins take about as much memory either way
+agentstate = "objects"
+
+#"agents" steps every hoomin on its own, "vectorized" moves them all at
+#once with numpy (needs agentstate = "arrays") and exchanges from a
+#snapshot of where everyone ended up, like the agents engine with
+#batchcontacts and snapshotcontacts on, whatever those are set to.
+#"replay" replays a recorded contact trace
+engine = "agents"
+
+#recordcontacts saves every contact a run makes to contacts.npy in its log
+#directory, and keeps the run going past completion until maxsteps (or
+#maxseconds) so protocols slower than the recording one can be replayed
+#on it. the "replay" engine skips movement entirely and replays the
+#contacts in the contacttrace file instead, which has to come from a run
+#with the same config and seed (or layout)
+recordcontacts = False
+contacttrace = ""
+
 # road generation tuning
 straightweight = 0.98
 leftweight = 0.01
@@ -30,6 +48,12 @@ initial_homes = homes_per_hoomins * initial_hoomins
 #radio tuning options
 bluetooth_range = 5
 
+#find contacts for the whole population with numpy instead of asking each
+#hoomin for its neighbors. snapshotcontacts moves everyone before any
+#exchange happens, otherwise each hoomin exchanges right after it moves
+batchcontacts = False
+snapshotcontacts = False
+
 '''
 Function called when exchanging scatterdata between two hoomins.
 
@@ -37,26 +61,18 @@ Self is hoomin initiating the exchange, hoomin is hoomin that self is
 exchanging with
 '''
 def send_blockdata(self, hoomin):
-    packets = self.random.sample(self.scatterbuffer, min(5,len(self.scatterbuffer)))
-    counter = 0
-    for packet in packets:
-        if packet not in hoomin.scatterbuffer:
-            hoomin.scatterbuffer.append(packet)
-            counter += 1
-    if hoomin.unique_id == self.model.final_hoomin_id:
-        self.model.total_scattermessages += counter
-
-    self.model.global_scattermessages += counter
-    self.friendgraph.add_node(hoomin)
-    for x in hoomin.friendlist:
-        h = self.model.schedule._agents[x]
-        self.friendgraph.add_node(h)
-        self.friendgraph.add_edge(hoomin, h)
+    self.model.protocol.on_contact(self, hoomin)
+
+    self.learn_friendsof(hoomin)
+    if self.model.config.friendexchange == "merge":
+        self.learn_known(hoomin, self.model.config.friendbudget)
 
     if self.unique_id == self.model.hoomin_zero_id:
-            self.model.hoominzero_nodecount = self.friendgraph.number_of_nodes()
+            self.model.hoominzero_nodecount = self.knownnodes
 
-    if nx.is_isomorphic(self.friendgraph, self.model.G):
+    #only real friendships are ever learned, so what's known matches
+    #model.G exactly once it has as many nodes and edges
+    if self.knownnodes == self.model.friendnodecount and self.knownedges == self.model.friendedgecount:
         self.complete = True
         print("we made it! hoomin ", self.unique_id, " has discovered true friendship!")
 
@@ -64,19 +80,91 @@ def send_blockdata(self, hoomin):
 
 
 def hoomin_init(self):
-    self.friendgraph = nx.Graph()
+    self.knownnodebits = 0
+    self.knownedgebits = 0
+    self.knownnodes = 0
+    self.knownedges = 0
     self.complete = False
 
 hoomininit = hoomin_init
 scatterfucntion = send_blockdata
 
 
+#which messages move when two hoomins meet: "scatter" (a random sample of
+#the sender's buffer), "epidemic", "sprayandwait", "prophet" or
+#"friendship". contactbandwidth is the most messages one contact can carry,
+#0 for no limit
+routingprotocol = "scatter"
+contactbandwidth = 5
+
+#what hoomins tell each other about the friend graph when they meet:
+#"friends" (themselves and their own friendships) or "merge" (that plus
+#everything else they know, one OR of the known bitsets). friendbudget is
+#the most bytes of known-edge bitset one merge can carry, 0 for no limit
+friendexchange = "friends"
+friendbudget = 0
+
+#copies each message starts with under spray and wait
+spraycopies = 8
+
+#PRoPHET encounter boost, transitivity scaling and per-step aging
+prophetpinit = 0.75
+prophetbeta = 0.25
+prophetgamma = 0.98
+
+
+#run budgets. a run that hits maxsteps steps or maxseconds of wall clock
+#stops and logs "<steps> censored <reason>" as its steps to completion.
+#stallsteps stops a run once the message count and the friend graph node
+#counts haven't changed for that many steps. 0 turns any of them off
+maxsteps = 20000
+maxseconds = 0
+stallsteps = 0
+
+
+#save the whole model every checkpointinterval steps (0 for never) to a
+#file called checkpoint in the run's log directory. batch trials pick up
+#from their checkpoint if they find one
+checkpointinterval = 0
+
+#time each phase of every step and write a per-run summary to a file
+#called profile in the run's log directory
+profile = False
+
+
 #visualization / performance options
 displayfriendgraph = True
 graphrefreshfreq = 10
 
+#log buffering. unbuffered logs hit the disk on every line, which is handy
+#for watching a run live. buffered logs are written every logflushlines
+#lines or logflushinterval seconds, on a background thread if logthreaded
+logbuffered = False
+logflushlines = 1000
+logflushinterval = 5.0
+logthreaded = False
+
+#metrics sampled every metricsinterval steps into a ring buffer holding the
+#last metricscapacity samples (names are in realhoomin/metrics.py). the
+#text logs and trace.npy are written at the same interval, and npy runs
+#save the samples to metrics.npy. headless runs skip mesa's DataCollector
+metrics = ("Messages Exchanged", "FriendGraph Node Count")
+metricsinterval = 1
+metricscapacity = 4096
+
+#per-step metrics format. "text" writes the totalmessages/friendnodes/
+#stepstocompletion logs, "npy" writes a single trace.npy per run instead,
+#"both" writes everything
+traceformat = "text"
+
 
 #social hoomin tuning options
 socialswitchprobability = 0.01
 randomswitchprobability = 0.05
 friendsperhoomin = 3
+
+#how socializing hoomins get to their friends. "random" wanders the roads,
+#"shortestpath" follows the road graph toward the friend. routecachesize
+#is how many destinations keep their shortest path trees around
+socialrouting = "random"
+routecachesize = 256
@@ -0,0 +1,75 @@
+'''
+Runs a parameter sweep from the command line.
+
+    python sweep.py rangesweep 20 grid bluetooth_range=2,4,8 friendsperhoomin=1,3
+    python sweep.py switches 20 lhs --points 30 socialswitchprobability=0.0:0.2 randomswitchprobability=0.0:0.2
+    python sweep.py switches 20 refine --points 10 socialswitchprobability=0.0:0.2 randomswitchprobability=0.0:0.2
+
+Everything not being swept comes from settings.py. Results go to
+<logdir>/<name>.csv, logs/ by default, and running the same command again
+only runs what's missing from it.
+'''
+
+import argparse
+
+import numpy as np
+
+from realhoomin.config import HoominConfig
+from realhoomin.sweep import Sweep, grid_design, lhs_design
+
+
+def number(text):
+    try:
+        return int(text)
+    except ValueError:
+        return float(text)
+
+
+def parse_space(specs, design):
+    space = {}
+    for spec in specs:
+        name, _, values = spec.partition("=")
+        if design == "grid":
+            space[name] = [number(v) for v in values.split(",")]
+        else:
+            low, _, high = values.partition(":")
+            space[name] = (number(low), number(high))
+    return space
+
+
+def report(point, trial, steps, censored):
+    if censored is None:
+        print(point, trial, "completed in", steps, "steps")
+    else:
+        print(point, trial, "stopped at", steps, "steps, censored:", censored)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="sweep HoominWorld parameters")
+    parser.add_argument("name")
+    parser.add_argument("trials", type=int)
+    parser.add_argument("design", choices=("grid", "lhs", "refine"))
+    parser.add_argument("params", nargs="+", help="name=v1,v2,... for grid, name=low:high otherwise")
+    parser.add_argument("--points", type=int, default=10, help="points for lhs and refine")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--baseseed", type=int, default=0)
+    parser.add_argument("--logdir", default="logs")
+    args = parser.parse_args()
+
+    space = parse_space(args.params, args.design)
+    sweep = Sweep(args.name, HoominConfig.from_settings(), args.trials, args.baseseed, args.logdir)
+
+    #grid and lhs draw from their own generator so the same command always
+    #picks the same points, and reruns resume instead of starting over.
+    #refine depends on the results so far, so the sweep saves the points it
+    #picked and a rerun finishes those before refining again
+    rng = np.random.default_rng(args.baseseed)
+    if args.design == "grid":
+        points = grid_design(space)
+    elif args.design == "lhs":
+        points = lhs_design(space, args.points, rng)
+    else:
+        points = sweep.refine(space, args.points, rng)
+
+    results = sweep.run(points, args.workers, report)
+    print("DONE,", len(results), "results in", sweep.path)